@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# bench_binary.py
+#
+# Compares `Doc.dumps()`/`Doc.loads()` with pickle
+# for documents of growing size, in size and decoding time.
+#
+# Run: python benchmarks/bench_binary.py
+
+import pickle
+import time
+
+from makeweb.html import Doc, body, div, h2, li, p, span, table, td, tr, ul
+
+
+def build(rows):
+    doc = Doc("html")
+    with body():
+        for section in range(8):
+            with div(cls="section", id="section-{}".format(section)):
+                h2("Section {}".format(section))
+                with table(cls="report"):
+                    for row in range(rows // 8):
+                        with tr(cls="row"):
+                            td(span(str(row), cls="n"))
+                            td(p("Value {}".format(row * section)))
+                with ul():
+                    [li("Item {}".format(n)) for n in range(10)]
+    return doc
+
+
+def best_of(func, runs=5):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(
+        "{:>8} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+            "nodes", "size", "pickle", "loads", "unpickle", "same"
+        )
+    )
+    for rows in (16, 250, 1000, 4000, 16000):
+        doc = build(rows)
+        nodes = rows * 5 + 8 * 13
+        data = doc.dumps()
+        pickled = pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL)
+        loads = best_of(lambda: Doc.loads(data))
+        unpickle = best_of(lambda: pickle.loads(pickled))
+        same = Doc.loads(data).render() == doc.render()
+        print(
+            "{:>8} {:>10} {:>10} {:>9.2f}ms {:>9.2f}ms {:>8}".format(
+                nodes,
+                len(data),
+                len(pickled),
+                loads * 1000,
+                unpickle * 1000,
+                str(same),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# bench_parallel.py
+#
+# Compares `Doc.render()` with `Doc.render(parallel=N)`
+# for documents of growing size, to find where the worker pool pays off.
+#
+# Run: python benchmarks/bench_parallel.py [workers]
+
+import os
+import sys
+import time
+
+from makeweb.html import Doc, body, div, h2, li, p, span, table, td, tr, ul
+from makeweb.parallel import render
+
+
+def build(rows):
+    doc = Doc("html")
+    with body():
+        for section in range(8):
+            with div(cls="section", id="section-{}".format(section)):
+                h2("Section {}".format(section))
+                with table(cls="report"):
+                    for row in range(rows // 8):
+                        with tr(cls="row"):
+                            td(span(str(row), cls="n"))
+                            td(p("Value {}".format(row * section)))
+                with ul():
+                    [li("Item {}".format(n)) for n in range(10)]
+    return doc
+
+
+def best_of(func, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else min(4, os.cpu_count() or 1)
+    print("workers: {}".format(workers))
+    print(
+        "{:>8} {:>10} {:>10} {:>10} {:>8}".format(
+            "nodes", "serial", "parallel", "ratio", "same"
+        )
+    )
+    for rows in (250, 1000, 4000, 16000, 40000):
+        doc = build(rows)
+        nodes = rows * 5 + 8 * 13
+        # min_nodes=0 always takes the parallel path, to find the crossover
+        # that MIN_NODES in makeweb.parallel is based on.
+        serial = best_of(doc.render)
+        parallel = best_of(lambda: render(doc, workers, min_nodes=0))
+        same = doc.render() == render(doc, workers, min_nodes=0)
+        print(
+            "{:>8} {:>9.1f}ms {:>9.1f}ms {:>10.2f} {:>8}".format(
+                nodes, serial * 1000, parallel * 1000, serial / parallel, str(same)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -52,12 +52,14 @@ from quart import Quart, Response
 from datetime import datetime
 import asyncio
 import json
+import os
 
 # Import Doc, CSS, JS along with the tags.
 from makeweb import (
     Doc,
     CSS,
     JS,
+    Include,
 )
 from makeweb.html import (
     head,
@@ -75,6 +77,7 @@ from makeweb.javascript import TimezZ, EventSource, document, console, JSON
 
 # Initialize app with Quart instead of Flask
 app = Quart(__name__)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 css = CSS()
 js = JS()
 
@@ -447,7 +450,10 @@ async def index():
                     "to January 19, 2038 03:14:07",
                     href="https://en.wikipedia.org/wiki/Year_2038_problem",
                 )
-        script(src="/static/timezz.js")
+        # Inline the timer library, it is memory-mapped once per process
+        # and saves the browser a round-trip.
+        with script():
+            Include(os.path.join(STATIC_DIR, "timezz.js"))
         with script():  # You can comment out this block
             js.embed()  # to test render_initial_timer()
     return Response(str(doc))
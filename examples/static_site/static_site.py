@@ -25,6 +25,7 @@ from markdown import markdown
 
 from makeweb.html import (
     Doc,
+    Raw,
     head,
     link,
     title,
@@ -53,7 +54,7 @@ def render_post(_title, author, published, content):
             h1(_title)
             h3(author)
             p(published)
-            div(markdown(content))
+            div(Raw(markdown(content)))
     return str(doc)
 
 
@@ -71,7 +72,7 @@ def render_index(_title, posts):
                     content = post["content"]
                     if len(content) > 50:
                         content = content[:50] + "..."
-                    p(markdown(content))
+                    p(Raw(markdown(content)))
 
     return str(doc)
 
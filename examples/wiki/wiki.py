@@ -55,12 +55,16 @@ import markdown
 from flask import Flask, Response, request, redirect
 
 import sqlite3
+from urllib.parse import quote
 
 # Makeweb, it a me!
 #  Run `pip install makeweb` to install MakeWeb.
-from makeweb import Doc, CSS, JS
+from makeweb import Doc, CSS, JS, Raw, component
 from makeweb.html import *
+from makeweb.html import paged_list
 from makeweb.javascript import document, window
+from makeweb.layout import Layout, slot
+from makeweb.serve import etag_for, flask_response, flask_static
 
 # And that concludes our imports!
 #
@@ -77,6 +81,9 @@ BASE_DIR = os.path.abspath(".")
 # Use 'static' directory under base to serve css.
 STATIC_DIR = os.path.join(BASE_DIR, "static/")
 
+# Generated files, such as the published stylesheet, are kept out of the sources.
+BUILD_DIR = os.path.join(BASE_DIR, "build/")
+
 DB_PATH = os.path.join(BASE_DIR, "wiki.db")
 
 # Setting HTML META tags here, keeps code uncluttered when there are many.
@@ -95,7 +102,11 @@ NAV = {
 
 SEARCH_FRAGMENT_LENGTH = 250
 
-css = CSS()
+SEARCH_PAGE_SIZE = 20
+
+# optimize=True merges, deduplicates and minifies the rules below
+# once, when the stylesheet is first rendered.
+css = CSS(optimize=True)
 
 # Add modern styling
 css(
@@ -414,37 +425,67 @@ def delete_topic(topic):
 # MakeWeb helps you write html (and even css and js!)
 # in a familiar python syntax.
 #
-# Here we define a render_base() template that will take in a few variables
-# and render an html document out of those.
+# Here we define a render_skeleton() template with the parts of the page
+# that never change, and mark the parts that do with `slot()`.
+# Layout renders the skeleton once, so every request only renders
+# the contents of its slots.
 # We will split up specific sections of the template into separate functions.
 # For our tiny wiki, a single page is sufficient.
 
 
-def render_base(topic, content, create, count, results=False, query=""):
+# The stylesheet is written once per deploy under a content-hashed name,
+# so browsers download it once instead of with every page.
+os.makedirs(BUILD_DIR, exist_ok=True)
+STYLESHEET = css.publish(BUILD_DIR, url="/assets/")
+
+
+def render_skeleton():
     doc = Doc("html")
     with head():
         meta(charset="utf-8")
         meta(name="viewport", content="width=device-width, initial-scale=1")
         [meta(**{k: v}) for k, v in META.items()]
-        title(topic)
-        with style():
-            css.embed()
+        title(slot("title"))
+        # A <link> to the published stylesheet, see STYLESHEET below.
+        doc.elements.append(STYLESHEET)
     with body(onkeydown="handle_shortcuts(event)"):  # Add event handler
         with div(cls="page"):
-            render_nav(doc, query)  # Pass query to render_nav
+            slot("nav")
             with div(cls="container"):  # Add container
                 with div(id="content-wrap"):
-                    render_content(doc, topic, content, create, results)
-            render_footer(doc, count)
+                    slot("content")
+            slot("footer")
         with script():  # Add JavaScript
             js.embed()
-    return str(doc)
+    return doc
+
+
+BASE = Layout(render_skeleton())
+
+# Identifies this build of the pages: the code and templates in this file
+# and the stylesheet URL. It is part of every version key below,
+# so after a deploy clients get the new markup instead of a 304.
+with open(__file__, "rb") as f:
+    BUILD = etag_for(f.read() + STYLESHEET.attrs["href"].encode("utf-8"))
+
+
+def render_base(topic, content, create, count, results=False, query=""):
+    # Slots are filled lazily, in page order.
+    return BASE.render(
+        title=topic,
+        nav=lambda: render_nav_fragment(query),
+        content=lambda: render_content(topic, content, create, results),
+        footer=lambda: render_footer(count),
+    )
 
 
 # Not *too* bad, eh?
-# Let us define the three render_... functions required by render_base().
+# Let us define the three render_... functions that fill the slots.
 
 
+# render_nav() only depends on its arguments, so each distinct query
+# is rendered once and the html is reused on later requests.
+@component(maxsize=256)
 def render_nav(doc, query=""):  # Add query parameter
     with nav():
         with div(cls="container"):  # Add container
@@ -457,7 +498,14 @@ def render_nav(doc, query=""):  # Add query parameter
                     )
 
 
-def render_content(doc, topic, content, create, results):
+def render_nav_fragment(query):
+    doc = Doc()
+    render_nav(doc, query)
+    return doc
+
+
+def render_content(topic, content, create, results):
+    doc = Doc()
     if results:  # Don't link "Results for..."
         h1(topic, id="topic")
     elif create:  # When editing, clicking on topic h1 cancels edit operation.
@@ -467,10 +515,12 @@ def render_content(doc, topic, content, create, results):
     if create:
         div(render_content_form(topic, content), id="content-edit")
     else:
-        div(render_markdown(str(content)), id="content-display")
+        # Markdown output is already html, Raw writes it out untouched.
+        div(Raw(render_markdown(str(content))), id="content-display")
+    return doc
 
 
-def render_footer(doc, count):
+def render_footer(count):
     # Isolated fragments of doc are great for testing!
     doc = Doc()  # Note the missing doctype 'html', we skip it for fragments.
     hr()
@@ -508,13 +558,27 @@ def render_content_form(topic, content):
 # Oh, a fragment for search results!
 
 
-def render_search_results(query, results):
+def render_search_results(query, results, cursor=None):
+    doc = Doc()
+    # Only one page of results is rendered, with links to the next and
+    # previous pages, however many topics match.
+    paged_list(
+        list(results.items()),
+        SEARCH_PAGE_SIZE,
+        render_search_result,
+        cursor=cursor,
+        endpoint="/search/{}".format(quote(query, safe="")),
+        id="search-results",
+    )
+    return doc
+
+
+def render_search_result(result):
+    topic, content = result
     doc = Doc()
-    with ul(id="search-results"):
-        for topic, content in results.items():
-            with li():
-                h5(a(topic, href="/{}".format(topic.lower())))
-                p(content)
+    with li():
+        h5(a(topic, href="/{}".format(topic.lower())))
+        p(content)
     return doc
 
 
@@ -583,7 +647,12 @@ def topic_page(topic):
         content = ""
         create = True
     count = count_topics()
-    return Response(render_base(original_topic, content, create, count))
+    # The page only depends on these values, so a client that already has
+    # this version gets a 304 without us rendering anything.
+    return flask_response(
+        lambda: render_base(original_topic, content, create, count),
+        version=(BUILD, original_topic, content, create, count),
+    )
 
 
 @app.route("/<topic>/edit")
@@ -628,7 +697,7 @@ def search_post():
     )
 
 
-@app.route("/search/<query>")
+@app.route("/search/<path:query>")
 def search_manual(query):
     results = search_topics(query)
 
@@ -637,7 +706,10 @@ def search_manual(query):
         return redirect(f"/{query}")  # Redirect to create new topic
 
     topic = "Results for {}".format(query)
-    content = render_search_results(query, results)
+    content = render_search_results(query, results, request.args.get("cursor"))
+    # Scripts fetching further pages only need the list itself.
+    if request.args.get("fragment"):
+        return Response(str(content))
     create = False
     count = count_topics()
     return Response(
@@ -645,7 +717,16 @@ def search_manual(query):
     )
 
 
-# Configure Flask's static route handler for css.
+# Published stylesheets never change under the same name,
+# flask_static() tells browsers to cache them for good.
+
+
+@app.route("/assets/<name>")
+def assets(name):
+    return flask_static(BUILD_DIR, name)
+
+
+# Configure Flask's static route handler for other files.
 
 app.static_folder = STATIC_DIR
 app.static_url_path = "/static"
@@ -1,7 +1,8 @@
 __version__ = "0.1.0"
 
+from .components import component
 from .defaults import defaults
-from .html import Doc, Tag, Text
+from .html import Doc, Include, Raw, RenderLimitExceeded, Tag, Text
 from .javascript import JS
 from .stylesheet import CSS
 from .utilities import fix_attribute, get_local_variable_from_caller
@@ -11,13 +12,29 @@ __all__ = [
     "Tag",
     "Doc",
     "Text",
+    "Raw",
+    "Include",
+    "RenderLimitExceeded",
     "CSS",
     "JS",
+    "component",
     "defaults",
     "fix_attribute",
     "get_local_variable_from_caller",
+    "binary",
+    "bundle",
+    "cache",
+    "components",
+    "compression",
     "html",
     "javascript",
+    "layout",
+    "optimizer",
+    "parallel",
+    "profiles",
+    "query",
+    "regions",
+    "serve",
     "stylesheet",
     "utilities",
 ]
@@ -0,0 +1,292 @@
+"""
+Compact binary encoding of Doc trees.
+
+Layout, all integers little-endian:
+
+    b"MKW" version:u8 width:u8 n_ints:u32 n_strings:u32
+    ints:    n_ints x width   flat preorder node array
+    lengths: n_strings x u32  byte length of each table entry
+    kinds:   n_strings x u8   1 for raw bytes, 0 for UTF-8 text
+    blob:    the table entries, one after another
+
+Documents keep their profile by name, see `makeweb.profiles.profiles`,
+profiles that are not registered there are stored with their options.
+Every tag name, attribute name, attribute value, text and raw fragment
+is stored once in the table and referred to by its index.
+Integers use the narrowest width (1, 2 or 4 bytes) that fits them all.
+
+Attribute values that are str, int, float, bool or None come back as they
+were, anything else (including str subclasses) comes back as its str.
+"""
+
+import json as _json
+import struct as _struct
+import sys as _sys
+from array import array as _array
+
+from .html import Doc, Include, Raw, Tag, Text, VoidTag, _iter_chunks
+from .profiles import Profile, profiles
+
+_MAGIC = b"MKW"
+_VERSION = 2
+_HEADER = _struct.Struct("<3sBBII")
+
+# Node kinds.
+_TAG, _STR, _TEXT, _RAW, _DOC, _INCLUDE = range(6)
+# Attribute value kinds.
+_VALUE, _TRUE, _FALSE, _INT, _FLOAT, _NONE = range(6)
+
+
+# array typecodes by item size, "I" is 4 bytes on every supported platform.
+_WIDTHS = {1: "B", 2: "H", 4: "I"}
+
+
+def _pack_array(code, values):
+    packed = _array(code, values)
+    if _sys.byteorder != "little":  # pragma: no cover
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_array(code, data):
+    packed = _array(code)
+    packed.frombytes(data)
+    if _sys.byteorder != "little":  # pragma: no cover
+        packed.byteswap()
+    return packed
+
+
+def _profile_options(profile):
+    if profile is None or profiles.get(profile.name) is profile:
+        return ""
+    options = dict(profile._options, void_tags=sorted(profile.void_tags))
+    return _json.dumps(options, sort_keys=True)
+
+
+def _load_profile(name, options):
+    if options:
+        return Profile(name, **_json.loads(options))
+    if name and name not in profiles:
+        raise ValueError("Unknown profile: {!r}".format(name))
+    return profiles.get(name)
+
+
+def dumps(doc):
+    """Encode `doc` and everything below it as bytes."""
+    table = {}
+    ints = []
+    emit = ints.append
+
+    def intern(value):
+        index = table.get(value)
+        if index is None:
+            index = table[value] = len(table)
+        return index
+
+    def encode(node):
+        if isinstance(node, str):
+            emit(_STR)
+            emit(intern(node))
+        elif isinstance(node, Text):
+            emit(_TEXT)
+            emit(intern(node.text))
+        elif isinstance(node, Tag) and type(node)._chunks is Tag._chunks:
+            emit(_TAG)
+            emit(intern(node.name))
+            emit(1 if node.close else 0)
+            emit(len(node.attrs))
+            for k, v in node.attrs.items():
+                emit(intern(k))
+                if v is True:
+                    emit(_TRUE)
+                    emit(0)
+                elif v is False:
+                    emit(_FALSE)
+                    emit(0)
+                elif v is None:
+                    emit(_NONE)
+                    emit(0)
+                elif type(v) is int:
+                    emit(_INT)
+                    emit(intern(str(v)))
+                elif type(v) is float:
+                    emit(_FLOAT)
+                    emit(intern(repr(v)))
+                else:
+                    emit(_VALUE)
+                    emit(intern(str(v)))
+            emit(len(node.elements))
+            for child in node.elements:
+                encode(child)
+        elif isinstance(node, Doc):
+            emit(_DOC)
+            encode_doc(node)
+        elif isinstance(node, Include):
+            emit(_INCLUDE)
+            emit(intern(node.path))
+        else:
+            # Raw, CSS, JS and anything else are kept as their rendered output.
+            if isinstance(node, Raw) and isinstance(node.content, str):
+                content = node.content
+            else:
+                content = b"".join(
+                    c.encode("utf-8") if isinstance(c, str) else bytes(c)
+                    for c in _iter_chunks(node)
+                )
+            emit(_RAW)
+            emit(intern(content))
+
+    def encode_doc(d):
+        emit(intern(d.doctype))
+        emit(intern(d.lang))
+        emit(intern(d.profile.name if d.profile is not None else ""))
+        emit(intern(_profile_options(d.profile)))
+        emit(len(d.elements))
+        for child in d.elements:
+            encode(child)
+
+    encode_doc(doc)
+    entries = [k.encode("utf-8") if isinstance(k, str) else k for k in table]
+    kinds = [1 if isinstance(k, bytes) else 0 for k in table]
+    largest = max(ints) if ints else 0
+    width = 1 if largest < 1 << 8 else 2 if largest < 1 << 16 else 4
+    return b"".join(
+        [
+            _HEADER.pack(_MAGIC, _VERSION, width, len(ints), len(entries)),
+            _pack_array(_WIDTHS[width], ints),
+            _pack_array(_WIDTHS[4], [len(e) for e in entries]),
+            _pack_array(_WIDTHS[1], kinds),
+            b"".join(entries),
+        ]
+    )
+
+
+def _attribute_value(kind, table, index):
+    if kind == _VALUE:
+        return table[index]
+    if kind == _TRUE:
+        return True
+    if kind == _FALSE:
+        return False
+    if kind == _INT:
+        return int(table[index])
+    if kind == _FLOAT:
+        return float(table[index])
+    if kind == _NONE:
+        return None
+    raise ValueError("Unknown attribute kind: {!r}".format(kind))
+
+
+def loads(data):
+    """
+    Decode bytes made by `dumps()` back into a Doc,
+    raises ValueError on anything else, such as truncated data.
+    """
+    try:
+        return _loads(data)
+    except (_struct.error, StopIteration, IndexError, KeyError, TypeError) as e:
+        raise ValueError("Corrupt MakeWeb binary document.") from e
+
+
+def _loads(data):
+    data = memoryview(data)
+    magic, version, width, n_ints, n_strings = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a MakeWeb binary document.")
+    offset = _HEADER.size
+    ints = _unpack_array(_WIDTHS[width], data[offset : offset + n_ints * width])
+    offset += n_ints * width
+    lengths = _unpack_array(_WIDTHS[4], data[offset : offset + n_strings * 4])
+    offset += n_strings * 4
+    if len(ints) != n_ints or len(lengths) != n_strings:
+        raise ValueError("Truncated MakeWeb binary document.")
+    if offset + n_strings + sum(lengths) != len(data):
+        raise ValueError("Truncated MakeWeb binary document.")
+    kinds = data[offset : offset + n_strings]
+    offset += n_strings
+    table = _table(data[offset:], lengths, kinds)
+    ints = ints.tolist()
+    doc, i = _doc_header(ints, 0, table)
+    # Iterative preorder walk, (elements, children left) of each open parent.
+    stack = []
+    elements, left = doc.elements, ints[i]
+    i += 1
+    new, raw, include = object.__new__, Raw.detached, Include.detached
+    while True:
+        if not left:
+            if not stack:
+                break
+            elements, left = stack.pop()
+            continue
+        left -= 1
+        kind = ints[i]
+        if kind == _STR:
+            elements.append(table[ints[i + 1]])
+            i += 2
+        elif kind == _TAG:
+            name, close, count = table[ints[i + 1]], ints[i + 2], ints[i + 3]
+            i += 4
+            attrs = {}
+            for _ in range(count):
+                vkind, v = ints[i + 1], ints[i + 2]
+                attrs[table[ints[i]]] = (
+                    table[v] if vkind == _VALUE else _attribute_value(vkind, table, v)
+                )
+                i += 3
+            tag = new(Tag if close else VoidTag)
+            tag.name, tag.attrs, tag.close = name, attrs, bool(close)
+            tag.elements = children = []
+            elements.append(tag)
+            count = ints[i]
+            i += 1
+            if count:
+                stack.append((elements, left))
+                elements, left = children, count
+        elif kind == _TEXT:
+            text = new(Text)
+            text.text = value = table[ints[i + 1]]
+            text.name, text.attrs, text.close = "text", {}, True
+            text.elements = [value]
+            elements.append(text)
+            i += 2
+        elif kind == _RAW:
+            elements.append(raw(table[ints[i + 1]]))
+            i += 2
+        elif kind == _INCLUDE:
+            elements.append(include(path=table[ints[i + 1]]))
+            i += 2
+        elif kind == _DOC:
+            child, i = _doc_header(ints, i + 1, table)
+            elements.append(child)
+            stack.append((elements, left))
+            elements, left = child.elements, ints[i]
+            i += 1
+        else:
+            raise ValueError("Unknown node kind: {!r}".format(kind))
+    if i != len(ints):
+        raise ValueError("Corrupt MakeWeb binary document.")
+    return doc
+
+
+def _table(blob, lengths, kinds):
+    text = "" if any(kinds) else str(blob, "utf-8")
+    if not any(kinds) and len(text) == len(blob):
+        # Plain ASCII text, decoded at once and sliced by the byte lengths.
+        table, offset = [], 0
+        for length in lengths:
+            table.append(text[offset : offset + length])
+            offset += length
+        return table
+    table, offset = [], 0
+    for length, kind in zip(lengths, kinds):
+        entry = blob[offset : offset + length]
+        table.append(bytes(entry) if kind else str(entry, "utf-8"))
+        offset += length
+    return table
+
+
+def _doc_header(ints, i, table):
+    doc = Doc()
+    doc.doctype, doc.lang = table[ints[i]], table[ints[i + 1]]
+    doc.profile = _load_profile(table[ints[i + 2]], table[ints[i + 3]])
+    return doc, i + 4
@@ -0,0 +1,160 @@
+"""
+CSS and JS bundles shared by all worker processes on a node.
+
+A bundle is built once, by the first process that needs it, and written
+to a file named after a hash of its content. A small key file, named after
+a hash of its source and of the makeweb package, points later processes
+at it. Every process then maps that file read-only, so workers skip
+building their own CSS() and JS() objects and share one copy of the bytes
+through the page cache:
+
+    def build_css():
+        css = CSS()
+        css("body", color="#222")
+        return css
+
+    STYLE = Bundle(build_css, "/tmp/myapp", "style.css")
+
+    ...
+    with style():
+        STYLE.embed()
+"""
+
+import contextlib as _contextlib
+import inspect as _inspect
+import os as _os
+
+try:
+    import fcntl as _fcntl
+except ImportError:  # pragma: no cover
+    _fcntl = None
+
+from .html import Doc, Include
+from .utilities import get_local_variable_from_caller, new_hash, write_atomic
+
+
+def _encode(result):
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        return bytes(result)
+    if hasattr(result, "__bytes__"):
+        return bytes(result)
+    return str(result).encode("utf-8")
+
+
+_package_key = None
+
+
+def _package():
+    # The library's own files, so upgrading makeweb rebuilds every bundle.
+    global _package_key
+    if _package_key is None:
+        digest = new_hash()
+        directory = _os.path.dirname(_os.path.abspath(__file__))
+        for name in sorted(_os.listdir(directory)):
+            if name.endswith(".py"):
+                with open(_os.path.join(directory, name), "rb") as f:
+                    digest.update(name.encode("utf-8"))
+                    digest.update(f.read())
+        _package_key = digest.hexdigest()
+    return _package_key
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read() or None
+    except FileNotFoundError:
+        return None
+
+
+def _source_key(build):
+    # The whole module that defines `build`, rules are usually added there.
+    try:
+        with open(_inspect.getsourcefile(build), "rb") as f:
+            return f.read()
+    except (OSError, TypeError):
+        return _inspect.getsource(build).encode("utf-8")
+
+
+@_contextlib.contextmanager
+def _lock(path):
+    # Only one process builds a bundle, the others wait for it and attach.
+    if _fcntl is None:  # pragma: no cover
+        yield
+        return
+    with open(path + ".lock", "wb") as f:
+        _fcntl.flock(f, _fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            _fcntl.flock(f, _fcntl.LOCK_UN)
+
+
+class Bundle(object):
+    """
+    The output of `build()`, a CSS, JS, str or bytes, shared through
+    a read-only file mapping in `directory`.
+
+    The file name is `name` with a hash of the content inserted before
+    the extension. `build()` is called again only when `source`, defaulting
+    to the module that defines `build`, or the makeweb package changes,
+    otherwise the published file is attached. `built` tells whether this
+    process built it. Pass `source` when `build()` also depends on other
+    modules or data files. An empty result gives an empty bundle.
+    """
+
+    def __init__(self, build, directory, name, source=None):
+        if source is None:
+            source = _source_key(build)
+        elif isinstance(source, str):
+            source = source.encode("utf-8")
+        digest = new_hash()
+        digest.update(_package().encode("utf-8"))
+        digest.update(source)
+        stem, ext = _os.path.splitext(name)
+        key = _os.path.join(
+            directory, "{}.{}{}.key".format(stem, digest.hexdigest()[:16], ext)
+        )
+        self.built = False
+        filename = _read(key)
+        if filename is None:
+            _os.makedirs(directory, exist_ok=True)
+            with _lock(key):
+                filename = _read(key)
+                if filename is None:
+                    data = _encode(build())
+                    content = new_hash()
+                    content.update(data)
+                    filename = "{}.{}{}".format(stem, content.hexdigest()[:16], ext)
+                    path = _os.path.join(directory, filename)
+                    if not _os.path.exists(path):
+                        write_atomic(path, data)
+                    write_atomic(key, filename.encode("utf-8"))
+                    self.built = True
+        self.filename = filename
+        self.path = _os.path.join(directory, filename)
+        self._include = Include.detached(path=self.path)
+
+    @property
+    def data(self):
+        """The bundle as a read-only memoryview of the shared mapping."""
+        mapped = self._include._map()
+        return memoryview(mapped)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __str__(self):
+        return str(self.data, "utf-8")
+
+    def __len__(self):
+        return len(self.data)
+
+    def _chunks(self, profile=None):
+        return self._include._chunks(profile)
+
+    def embed(self):
+        """Add the bundle to the caller's Doc, such as inside `style()`."""
+        doc = get_local_variable_from_caller("doc", Doc)
+        doc.elements.append(self._include)
+        doc._version += 1
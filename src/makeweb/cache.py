@@ -0,0 +1,185 @@
+"""
+Fragment cache shared by all worker processes on a node.
+
+Rendered fragments are stored as bytes in a SQLite file,
+keyed by a fragment key and a version, for example a topic name
+and the hash of its content. Every write is a single transaction,
+so readers in other processes never see a partial fragment.
+"""
+
+import os as _os
+import sqlite3 as _sqlite3
+import threading as _threading
+import time as _time
+import weakref as _weakref
+
+from .html import Doc, Raw
+
+# Access times are only refreshed this often, so reads rarely need a write lock.
+_TOUCH_INTERVAL = 1.0
+
+# Open connections of this process by id, closed along with their cache.
+# sqlite3 connections are only freed by the garbage collector otherwise,
+# possibly in a forked child.
+_connections = {}
+# Connections inherited from the parent process, kept open and never used:
+# closing one would drop the SQLite locks the child's own connections hold
+# on the same file, and let SQLite delete a WAL index others are using.
+_inherited = []
+
+
+def _keep_inherited():
+    _inherited.extend(_connections.values())
+    _connections.clear()
+
+
+def _close(ids):
+    for key in ids:
+        db = _connections.pop(key, None)
+        if db is not None:
+            db.close()
+
+
+if hasattr(_os, "register_at_fork"):
+    _os.register_at_fork(after_in_child=_keep_inherited)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (key, version)
+);
+CREATE INDEX IF NOT EXISTS fragments_used ON fragments (used);
+"""
+
+
+def _to_bytes(data):
+    if isinstance(data, Doc):
+        return b"".join(data.iter_bytes())
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return bytes(data)
+
+
+class FragmentCache(object):
+    """
+    Size-bounded, least-recently-used cache of rendered fragments.
+
+    `path` is the SQLite file shared by the processes,
+    `max_bytes` bounds the total size of the stored fragments.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, timeout=10.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._open()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def __getstate__(self):
+        return {"path": self.path, "max_bytes": self.max_bytes, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def _open(self):
+        self._local = _threading.local()
+        self._ids = []
+        _weakref.finalize(self, _close, self._ids)
+
+    def _connect(self):
+        # SQLite connections must not be shared across threads or forks.
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != _os.getpid():
+            # Closed by whichever thread frees the cache, used by one only.
+            db = _sqlite3.connect(
+                self.path, timeout=self.timeout, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, _os.getpid()
+            _connections[id(db)] = db
+            self._ids.append(id(db))
+        return db
+
+    def get(self, key, version=""):
+        """Return the cached bytes for `key` at `version`, or None."""
+        db = self._connect()
+        row = db.execute(
+            "SELECT data, used FROM fragments WHERE key = ? AND version = ?",
+            (key, str(version)),
+        ).fetchone()
+        if row is None:
+            return None
+        now = _time.time()
+        if now - row[1] > _TOUCH_INTERVAL:
+            with db:
+                db.execute(
+                    "UPDATE fragments SET used = ? WHERE key = ? AND version = ?",
+                    (now, key, str(version)),
+                )
+        return bytes(row[0])
+
+    def set(self, key, version, data):
+        """Store `data` (str, bytes or Doc), replacing older versions of `key`."""
+        data = _to_bytes(data)
+        if len(data) > self.max_bytes:
+            return
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM fragments WHERE key = ?", (key,))
+            db.execute(
+                "INSERT INTO fragments (key, version, data, size, used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, str(version), data, len(data), _time.time()),
+            )
+            self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM fragments").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, version, size in db.execute(
+            "SELECT key, version, size FROM fragments ORDER BY used"
+        ).fetchall():
+            db.execute(
+                "DELETE FROM fragments WHERE key = ? AND version = ?", (key, version)
+            )
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def fragment(self, key, version, render, *args, **kwargs):
+        """
+        Return a Raw node with the cached fragment,
+        calling `render(*args, **kwargs)` to produce it on a miss.
+        """
+        data = self.get(key, version)
+        if data is None:
+            data = _to_bytes(render(*args, **kwargs))
+            self.set(key, version, data)
+        return Raw.detached(data)
+
+    def delete(self, key):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM fragments WHERE key = ?", (key,))
+
+    def clear(self):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM fragments")
+
+    def stats(self):
+        """Return `(count, bytes)` of the stored fragments."""
+        return tuple(
+            self._connect()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fragments")
+            .fetchone()
+        )
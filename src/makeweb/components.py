@@ -0,0 +1,144 @@
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+from collections import namedtuple as _namedtuple
+from functools import wraps as _wraps
+
+from .html import Doc, Raw
+from .utilities import get_local_variable_from_caller
+
+CacheInfo = _namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize", "bytes"])
+
+_DOC = object()  # Stands in for Doc arguments in cache keys.
+
+
+def _make_key(args, kwargs):
+    key = tuple(_DOC if isinstance(a, Doc) else a for a in args)
+    if kwargs:
+        key += (_DOC,) + tuple(
+            (k, _DOC if isinstance(v, Doc) else v) for k, v in sorted(kwargs.items())
+        )
+    hash(key)
+    return key
+
+
+def _fragment(html):
+    doc = Doc()
+    doc.elements.append(Raw.detached(html))
+    return doc
+
+
+class _Entry(object):
+    __slots__ = ("body", "result", "is_doc", "size", "expires")
+
+
+def component(maxsize=128, ttl=None, max_bytes=None):
+    """
+    Memoize a render helper by its (hashable) arguments.
+
+    The decorated function runs once per distinct set of arguments,
+    whatever it adds to the enclosing Doc is serialized and cached,
+    and later calls splice the cached html into the caller's Doc
+    without running the function body.
+    Doc arguments are not part of the key.
+
+    The cached html is spliced in as Raw, so `doc.select()`, `by_id()` and
+    the other lookups do not see the tags inside a component.
+
+    Entries are evicted least-recently-used first once there are more than
+    `maxsize` of them or they take more than `max_bytes`,
+    and expire `ttl` seconds after they were rendered.
+    `wrapper.cache_info()` reports hits and misses.
+
+    Heads-up: only cache pure functions of their arguments!
+    """
+    if callable(maxsize):
+        return component()(maxsize)
+
+    def decorator(func):
+        cache = _OrderedDict()
+        lock = _threading.RLock()
+        stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+        def evict():
+            while cache and (
+                (maxsize is not None and len(cache) > maxsize)
+                or (max_bytes is not None and stats["bytes"] > max_bytes)
+            ):
+                _, old = cache.popitem(last=False)
+                stats["bytes"] -= old.size
+
+        def render(args, kwargs):
+            # Tags called inside `func` find this `doc` when `func` has none,
+            # Doc arguments are swapped for it as well.
+            doc = Doc()
+            args = [doc if isinstance(a, Doc) else a for a in args]
+            kwargs = {k: doc if isinstance(v, Doc) else v for k, v in kwargs.items()}
+            result = func(*args, **kwargs)
+            entry = _Entry()
+            entry.body = str(doc).encode("utf-8")
+            entry.is_doc = isinstance(result, Doc)
+            entry.result = str(result) if entry.is_doc else result
+            entry.size = len(entry.body)
+            if isinstance(entry.result, str):
+                entry.size += len(entry.result.encode("utf-8"))
+            entry.expires = None if ttl is None else _time.monotonic() + ttl
+            return entry
+
+        @_wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = _make_key(args, kwargs)
+            except TypeError:  # Unhashable arguments can not be cached.
+                return func(*args, **kwargs)
+            enclosing = next(
+                (a for a in list(args) + list(kwargs.values()) if isinstance(a, Doc)),
+                None,
+            )
+            if enclosing is None:
+                try:
+                    enclosing = get_local_variable_from_caller("doc", Doc)
+                except LookupError:
+                    pass
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and (
+                    entry.expires is None or entry.expires > _time.monotonic()
+                ):
+                    cache.move_to_end(key)
+                    stats["hits"] += 1
+                else:
+                    entry = None
+                    stats["misses"] += 1
+            if entry is None:
+                entry = render(args, kwargs)
+                with lock:
+                    old = cache.pop(key, None)
+                    if old is not None:
+                        stats["bytes"] -= old.size
+                    cache[key] = entry
+                    stats["bytes"] += entry.size
+                    evict()
+            if entry.body and enclosing is not None:
+                enclosing.elements.append(Raw.detached(entry.body))
+                enclosing._version += 1
+            if entry.is_doc:
+                return _fragment(entry.result)
+            return entry.result
+
+        def cache_info():
+            with lock:
+                return CacheInfo(
+                    stats["hits"], stats["misses"], maxsize, len(cache), stats["bytes"]
+                )
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                stats.update(hits=0, misses=0, bytes=0)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,128 @@
+import zlib as _zlib
+from functools import lru_cache as _lru_cache
+
+# Preferred order when the client accepts more than one encoding.
+codecs = ("br", "zstd", "gzip")
+
+# File name suffixes of precompressed files.
+suffixes = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+
+# Slowest, smallest settings, for files compressed once at build time.
+max_levels = {"gzip": 9, "br": 11, "zstd": 19}
+
+
+class _Gzip(object):
+    def __init__(self, level=None):
+        level = 6 if level is None else level
+        # wbits=31 selects the gzip container instead of raw zlib.
+        self._obj = _zlib.compressobj(level, _zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _Brotli(object):
+    def __init__(self, level=None):
+        try:
+            import brotli
+        except ImportError:  # pragma: no cover
+            raise ImportError("Please `pip install brotli` to use br compression.")
+        quality = 5 if level is None else level
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.finish()
+
+
+class _Zstd(object):
+    def __init__(self, level=None):
+        try:
+            import zstandard
+        except ImportError:  # pragma: no cover
+            raise ImportError("Please `pip install zstandard` to use zstd compression.")
+        level = 3 if level is None else level
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+_compressors = {"gzip": _Gzip, "br": _Brotli, "zstd": _Zstd}
+
+
+@_lru_cache(maxsize=None)
+def available(codec):
+    """Return True if `codec` can be used in this environment."""
+    try:
+        compressor(codec)
+    except ImportError:
+        return False
+    return True
+
+
+def compressor(codec, level=None):
+    """
+    Return an incremental compressor for `codec` ("gzip", "br" or "zstd").
+
+    The returned object has `compress(data) -> bytes` and `flush() -> bytes`.
+    """
+    if codec not in _compressors:
+        raise ValueError(
+            "Expected codec in: {}, got: {!r}".format(",".join(codecs), codec)
+        )
+    return _compressors[codec](level)
+
+
+def compress(data, codec, level=None):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    c = compressor(codec, level)
+    return c.compress(data) + c.flush()
+
+
+@_lru_cache(maxsize=256)
+def compress_cached(text, codec, level=None):
+    """
+    Compress `text` once and reuse the bytes for as long as it stays unchanged.
+
+    Meant for content that never changes after import,
+    such as stylesheet and script bundles.
+    """
+    return compress(text, codec, level)
+
+
+def negotiate(accept_encoding, offered=codecs):
+    """
+    Pick the best codec from `offered` for an `Accept-Encoding` header value.
+
+    Returns None when the response should be sent uncompressed.
+    """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    best, best_q = None, 0.0
+    for codec in offered:
+        q = accepted.get(codec, accepted.get("*", 0.0))
+        if q > best_q and available(codec):
+            best, best_q = codec, q
+    return best
@@ -5,6 +5,11 @@ class defaults:
     replace_className = True
     replace_cls = True
     preserve_vendor_prefixes = True  # Add this line
+    # Construction mode used by Doc() when none is given:
+    # "fast" skips per-element validation and deprecation warnings,
+    # "strict" additionally checks nesting rules.
+    mode = "default"
+    modes = {"fast", "default", "strict"}
     # https://html.spec.whatwg.org/multipage/syntax.html#the-doctype
     doctypes = {"html"}
     # https://developer.mozilla.org/en-US/docs/Web/HTML/Element
@@ -171,3 +176,27 @@ class defaults:
         "tt",
         "xmp",
     }
+    # Nesting rules checked in "strict" mode: tag => permitted parents.
+    permitted_parents = {
+        "li": {"ul", "ol", "menu"},
+        "dt": {"dl", "div"},
+        "dd": {"dl", "div"},
+        "tr": {"table", "thead", "tbody", "tfoot"},
+        "td": {"tr"},
+        "th": {"tr"},
+        "thead": {"table"},
+        "tbody": {"table"},
+        "tfoot": {"table"},
+        "caption": {"table"},
+        "colgroup": {"table"},
+        "option": {"select", "datalist", "optgroup"},
+        "optgroup": {"select"},
+        "legend": {"fieldset"},
+        "figcaption": {"figure"},
+        "summary": {"details"},
+        "source": {"audio", "video", "picture"},
+        "track": {"audio", "video"},
+        "param": {"object"},
+        "head": {"html"},
+        "body": {"html"},
+    }
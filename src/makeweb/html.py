@@ -1,6 +1,15 @@
+import base64 as _base64
+import json as _json
+import mmap as _mmap
+import os as _os
+import socket as _socket
 import sys as _sys
+import time as _time
 import warnings as _warnings
+import weakref as _weakref
+from collections import namedtuple as _namedtuple
 from functools import partial as _partial
+from itertools import islice as _islice
 
 # Suppress specific AST deprecation warnings from javascripthon
 _warnings.filterwarnings(
@@ -9,62 +18,674 @@ _warnings.filterwarnings(
 _warnings.filterwarnings("ignore", message="ast.Str is deprecated")
 _warnings.filterwarnings("ignore", message="Attribute s is deprecated")
 
+from . import compression as _compression
 from .defaults import defaults
-from .utilities import fix_attribute, get_local_variable_from_caller
+from .utilities import fix_attribute, get_local_variable_from_caller, new_hash
+
+# Serialized chunks are batched up to this many characters
+# before they are handed to a compressor.
+_COMPRESS_BUFFER = 16384
+
+
+def _iter_chunks(node, profile=None):
+    chunks = getattr(node, "_chunks", None)
+    if chunks is None:
+        yield str(node)
+    else:
+        yield from chunks(profile)
+
+
+def _format_attrs(attrs):
+    formatted = "".join(
+        [' {}="{}"'.format(k, v) for k, v in attrs.items() if not isinstance(v, bool)]
+    )
+    # Handle boolean attributes separately.
+    formatted += "".join(
+        [" {}".format(k) for k, v in attrs.items() if isinstance(v, bool)]
+    )
+    return formatted
+
+
+def _class_list(attrs):
+    # `cls` may be a list of class names, such as tokens from CSS.scoped().
+    value = attrs.get("class")
+    if isinstance(value, (list, tuple)):
+        attrs["class"] = " ".join(c for c in value if c)
+    return attrs
+
+
+def _tag_parts(name, attrs, close, profile=None):
+    """
+    Return the opening and closing markup of a tag,
+    closing is None for void tags.
+    """
+    if profile is None:
+        attrs = _format_attrs(attrs) if attrs else ""
+        if not close:
+            return "<{}{} />".format(name, attrs), None
+    else:
+        attrs = profile.format_attrs(attrs) if attrs else ""
+        if not close or name in profile.void_tags:
+            return "<" + name + attrs + profile.self_closing, None
+    return "<{}{}>".format(name, attrs), "</{}>".format(name)
+
+
+class _Encoded(bytes):
+    """UTF-8 bytes that keep the str they were encoded from."""
+
+    def __new__(cls, text):
+        self = bytes.__new__(cls, text.encode("utf-8"))
+        self.text = text
+        return self
+
+    def __reduce__(self):
+        return (_Encoded, (self.text,))
+
+
+def _text(chunks):
+    # Raw nodes may emit bytes-like chunks, decode them for str output.
+    for chunk in chunks:
+        if type(chunk) is not str:
+            chunk = chunk.text if type(chunk) is _Encoded else str(chunk, "utf-8")
+        yield chunk
+
+
+def _encoded(chunks):
+    for chunk in chunks:
+        if type(chunk) is str:
+            chunk = chunk.encode("utf-8")
+        yield chunk
+
+
+def _placed(children):
+    # Fragments and regions add no markup, their contents end up in the parent.
+    for child in children:
+        if isinstance(child, Doc) and not child.doctype:
+            yield from _placed(child.elements)
+        else:
+            yield child
+
+
+def _check_nesting(parent, children):
+    children = list(_placed(children))
+    if children and (parent.name in defaults.void_tags or not parent.close):
+        raise ValueError("Void tag {!r} can not have children.".format(parent.name))
+    for child in children:
+        if isinstance(child, Tag) and not isinstance(child, Text):
+            permitted = defaults.permitted_parents.get(child.name)
+            if permitted is not None and parent.name not in permitted:
+                raise ValueError(
+                    "Tag {!r} is not permitted inside {!r}, expected one of: {}".format(
+                        child.name, parent.name or "<root>", ",".join(sorted(permitted))
+                    )
+                )
+
+
+class RenderLimitExceeded(Exception):
+    """
+    Raised when a render crosses its `max_bytes` or `deadline`,
+    `limit` names the limit and `written` counts the bytes emitted before.
+    """
+
+    def __init__(self, limit, written):
+        super(RenderLimitExceeded, self).__init__(
+            "Render exceeded {} after {} bytes.".format(limit, written)
+        )
+        self.limit = limit
+        self.written = written
+
+
+# Marker rendered in place of the rest of a truncated document.
+_TRUNCATED = '<div class="truncated" data-limit="{}"></div>'
+_LIMITS = ("max_bytes", "deadline")
+
+
+def _walk_chunks(node, profile):
+    # Like _iter_chunks, but yields (chunk, closer) pairs: the closing markup
+    # for chunks that open a tag, False for chunks that close one, else None.
+    if isinstance(node, Doc):
+        if node._strict and node.doctype:
+            _check_nesting(_ROOT, node.elements)
+        profile = node.profile or profile
+        begin, end = node._header(), node._footer()
+    elif isinstance(node, Tag) and type(node)._chunks is Tag._chunks:
+        begin, end = _tag_parts(node.name, node.attrs, node.close, profile)
+    else:
+        for chunk in _iter_chunks(node, profile):
+            yield chunk, None
+        return
+    if not end:
+        if begin:
+            yield begin, None
+        if end is None:
+            return
+    else:
+        yield begin, end
+    for child in node.elements:
+        if child:
+            yield from _walk_chunks(child, profile)
+    if end:
+        yield end, False
+
+
+def _size(chunk):
+    if type(chunk) is not str or chunk.isascii():
+        return len(chunk)
+    return len(chunk.encode("utf-8"))
+
+
+def _limited(node, profile, max_bytes, deadline, truncate):
+    budget = float("inf") if max_bytes is None else max_bytes
+    expires = None if deadline is None else _time.monotonic() + deadline
+    monotonic = _time.monotonic
+    if truncate is True:
+        markers = {limit: _TRUNCATED.format(limit) for limit in _LIMITS}
+    elif truncate:
+        marker = "".join(_text(_iter_chunks(truncate, profile)))
+        markers = dict.fromkeys(_LIMITS, marker)
+    else:
+        markers = dict.fromkeys(_LIMITS, "")
+    # Room kept for a marker and the closing tags, so output fits max_bytes.
+    reserve = max(_size(m) for m in markers.values())
+    closers, closing = [], 0
+    # Chunks that fit only if nothing has to be truncated after them,
+    # held back with the closers from before them.
+    pending, pending_size, saved = [], 0, None
+    written = 0
+    for chunk, closer in _walk_chunks(node, profile):
+        size = _size(chunk)
+        if closer:
+            after = closing + _size(closer)
+        elif closer is False:
+            after = closing - _size(closers[-1])
+        else:
+            after = closing
+        total = written + pending_size + size
+        if total + after > budget:
+            limit = "max_bytes"
+        elif expires is not None and monotonic() > expires:
+            limit = "deadline"
+        else:
+            if not pending and total + after + reserve > budget:
+                saved = (list(closers), closing)
+            pending.append(chunk)
+            pending_size += size
+            if closer:
+                closers.append(closer)
+            elif closer is False:
+                closers.pop()
+            closing = after
+            if total + after + reserve <= budget:
+                yield from pending
+                written += pending_size
+                pending, pending_size = [], 0
+            continue
+        if not truncate:
+            raise RenderLimitExceeded(limit, written)
+        if pending:
+            closers, closing = saved
+        marker = markers[limit]
+        if written + _size(marker) + closing <= budget:
+            yield marker
+        yield from reversed(closers)
+        return
+    yield from pending
 
 
 class Doc(object):
-    def __init__(self, doctype="", lang="en"):
+    def __init__(self, doctype="", lang="en", mode=None, profile=None):
         if doctype and doctype not in defaults.doctypes:
             _warnings.warn("Expected doctype in:" + ",".join(defaults.doctypes))
+        mode = mode or defaults.mode
+        if mode not in defaults.modes:
+            raise ValueError(
+                "Expected mode in: {}, got: {!r}".format(",".join(defaults.modes), mode)
+            )
+        # Resolved once here, so tags only read a flag.
+        self.mode = mode
+        self._validate = mode != "fast"
+        self._strict = mode == "strict"
+        # See makeweb.profiles, None keeps following the `defaults` flags.
+        self.profile = profile
         self.lang = lang
         self.elements = []
         self.parent = "<root>"
         self.doctype = doctype
+        self.frozen = False
+        self._compressed = {}
+        # Bumped whenever a tag is added, so cached results can be invalidated.
+        self._version = 0
+        self._etag = None
+        self._index = None
 
     def __str__(self):
-        header = ""
-        footer = ""
+        return "".join(_text(self._chunks()))
+
+    def _header(self):
+        if self.doctype and self.profile is not None:
+            return self.profile.header(self.lang)
+        if self.doctype:
+            return '<!doctype {}><html lang="{}">'.format(self.doctype, self.lang)
+        return ""
+
+    def _footer(self):
+        return "</html>" if self.doctype else ""
+
+    def _chunks(self, profile=None):
+        if self._strict and self.doctype:
+            _check_nesting(_ROOT, self.elements)
+        # Fragments follow the profile of the document they are rendered in.
+        profile = self.profile or profile
+        if self.doctype:
+            yield self._header()
+        for e in self.elements:
+            yield from _iter_chunks(e, profile)
         if self.doctype:
-            header = '<!doctype {}><html lang="{}">'.format(self.doctype, self.lang)
-            footer = "</html>"
-        return header + "".join([str(e) for e in self.elements]) + footer
+            yield self._footer()
+
+    def render(
+        self,
+        parallel=None,
+        region=None,
+        max_bytes=None,
+        deadline=None,
+        truncate=False,
+    ):
+        """
+        Return the document as a str.
+
+        With `parallel=N` large documents are split into independent subtrees
+        that are serialized by N worker processes (threads on free-threaded
+        Python builds) and joined back in order. Documents below
+        `makeweb.parallel.MIN_NODES` nodes are rendered serially.
+        The workers are forked on first use and kept, do not use `parallel`
+        from multithreaded servers unless `makeweb.parallel.start(N)`
+        forked them at startup, before any threads.
+        With `region=name` only the contents of that region are returned,
+        see `makeweb.regions`.
+
+        `max_bytes` (UTF-8 encoded) and `deadline` (seconds) are checked
+        before every chunk, crossing either raises RenderLimitExceeded.
+        With `truncate=True` the output ends with a marker instead,
+        and the open tags are closed, all within `max_bytes`. `truncate`
+        may also be the marker itself, as a str or node. Limited renders
+        are serial, combining them with `parallel` raises ValueError.
+        """
+        node = self
+        if region is not None:
+            # Imported here, makeweb.regions depends on this module.
+            from . import regions as _regions
+
+            node = _regions.find(self, region)
+            if node is None:
+                raise LookupError("Region {!r} not found.".format(region))
+        if max_bytes is not None or deadline is not None:
+            if parallel and parallel > 1:
+                raise ValueError("Limited renders can not be parallel.")
+            chunks = _limited(node, self.profile, max_bytes, deadline, truncate)
+            return "".join(_text(chunks))
+        if node is not self:
+            return "".join(_text(node._chunks(self.profile)))
+        if parallel and parallel > 1:
+            # Imported here, makeweb.parallel depends on this module.
+            from . import parallel as _parallel
+
+            return _parallel.render(self, parallel)
+        return str(self)
+
+    def invalidate(self):
+        """
+        Drop cached results (ETag, lookup indexes) after changing
+        `elements` or `attrs` of tags directly.
+        """
+        self._version += 1
+
+    def _lookup(self):
+        # Imported here, makeweb.query depends on this module.
+        from .query import Index
+
+        if self._index is None or self._index[0] != self._version:
+            self._index = (self._version, Index(self))
+        return self._index[1]
+
+    def by_id(self, id):
+        """Return the tag with `id`, or None."""
+        return self._lookup().ids.get(id)
+
+    def by_class(self, name):
+        """Return the tags that have class `name`, in document order."""
+        return list(self._lookup().classes.get(name, ()))
+
+    def by_tag(self, name):
+        """Return the tags named `name`, in document order."""
+        return list(self._lookup().tags.get(name, ()))
+
+    def select(self, selector):
+        """
+        Return the tags matching a CSS `selector`, in document order,
+        see `makeweb.query` for the supported subset.
+        """
+        return self._lookup().select(selector)
+
+    def dumps(self):
+        """Return the document tree in a compact binary form, see `loads()`."""
+        # Imported here, makeweb.binary depends on this module.
+        from . import binary as _binary
+
+        return _binary.dumps(self)
+
+    @classmethod
+    def loads(cls, data):
+        """Rebuild a document from the bytes returned by `dumps()`."""
+        from . import binary as _binary
+
+        return _binary.loads(data)
+
+    def iter_render(self):
+        """Yield the document as str chunks, without joining them."""
+        return _text(self._chunks())
+
+    def iter_bytes(self):
+        """
+        Yield the document as UTF-8 encoded chunks,
+        computing its `etag` along the way.
+        """
+        version, digest = self._version, new_hash()
+        for data in _encoded(self._chunks()):
+            digest.update(data)
+            yield data
+        self._etag = (version, '"{}"'.format(digest.hexdigest()))
+
+    @property
+    def etag(self):
+        """Strong ETag for the current content, computed by the last render."""
+        if self._etag is None or self._etag[0] != self._version:
+            for _ in self.iter_bytes():
+                pass
+        return self._etag[1]
+
+    def render_to(self, sink):
+        """
+        Write the document to the binary file-like `sink`,
+        returns the number of bytes written.
+
+        When `sink` is a socket (or a file made by `socket.makefile()`),
+        included files are sent with `os.sendfile()` straight from the page cache.
+        """
+        fd = _socket_fileno(sink)
+        # A bare socket has no buffer of its own, small chunks are gathered.
+        buffered = isinstance(sink, _socket.socket)
+        write = sink.sendall if buffered else sink.write
+        written, pending, size = 0, [], 0
+        for data in self.iter_bytes():
+            if fd is not None and isinstance(data, memoryview):
+                mapped = data.obj
+                if isinstance(mapped, _MappedFile):
+                    if pending:
+                        write(b"".join(pending))
+                        pending, size = [], 0
+                    if hasattr(sink, "flush"):
+                        sink.flush()
+                    # The descriptor that was mapped, so the bytes sent
+                    # are the ones that were hashed.
+                    _sendfile(fd, mapped.fd, len(data))
+                    written += len(data)
+                    continue
+            written += len(data)
+            if buffered:
+                pending.append(data)
+                size += len(data)
+                if size >= _SEND_BUFFER:
+                    write(b"".join(pending))
+                    pending, size = [], 0
+            else:
+                write(data)
+        if pending:
+            write(b"".join(pending))
+        return written
+
+    def freeze(self):
+        """
+        Promise that this document will not change any more,
+        so its compressed forms can be cached.
+        """
+        self.frozen = True
+        return self
+
+    def render_compressed(self, codec="gzip", level=None):
+        """
+        Yield the document as compressed bytes, feeding serialized chunks
+        straight into an incremental compressor.
+        """
+        if self.frozen:
+            key = (codec, level)
+            if key not in self._compressed:
+                self._compressed[key] = b"".join(self._render_compressed(codec, level))
+            yield self._compressed[key]
+            return
+        yield from self._render_compressed(codec, level)
+
+    def _render_compressed(self, codec, level):
+        compressor = _compression.compressor(codec, level)
+        version, digest = self._version, new_hash()
+        buffer, size = [], 0
+        for chunk in self._chunks():
+            if type(chunk) is not str:
+                # Pre-rendered bytes go to the compressor without a copy.
+                data = "".join(buffer).encode("utf-8")
+                digest.update(data)
+                digest.update(chunk)
+                out = compressor.compress(data) + compressor.compress(chunk)
+                buffer, size = [], 0
+                if out:
+                    yield out
+                continue
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= _COMPRESS_BUFFER:
+                data = "".join(buffer).encode("utf-8")
+                digest.update(data)
+                out = compressor.compress(data)
+                buffer, size = [], 0
+                if out:
+                    yield out
+        data = "".join(buffer).encode("utf-8")
+        digest.update(data)
+        self._etag = (version, '"{}"'.format(digest.hexdigest()))
+        out = compressor.compress(data) + compressor.flush()
+        if out:
+            yield out
+
+
+class Raw(object):
+    """
+    Pre-rendered HTML that is written to the output as-is.
+
+    `content` may be a str, bytes, memoryview or mmap.
+    Alternatively `path` names a file that is memory-mapped at render time,
+    so large static fragments are never loaded into a Python str.
+    """
+
+    def __init__(self, content=None, path=None):
+        self._setup(content, path)
+        doc = get_local_variable_from_caller("doc", Doc)
+        doc.elements.append(self)
+        doc._version += 1
+
+    @classmethod
+    def detached(cls, content=None, path=None):
+        """Create a Raw node without adding it to the caller's Doc."""
+        raw = cls.__new__(cls)
+        raw._setup(content, path)
+        return raw
+
+    def _setup(self, content, path):
+        if (content is None) == (path is None):
+            raise TypeError("Raw expects either content or path.")
+        if content is not None and not isinstance(
+            content, (str, bytes, memoryview, _mmap.mmap)
+        ):
+            raise TypeError(
+                "Expected Raw content to be str, bytes, memoryview or mmap, "
+                "got: {!r}".format(type(content))
+            )
+        self.content = content
+        self.path = path
+
+    def __str__(self):
+        return "".join(_text(self._chunks()))
+
+    def _chunks(self, profile=None):
+        content = self.content
+        if content is None:
+            content = self._map()
+        if isinstance(content, str):
+            yield content
+        elif len(content):
+            yield content if isinstance(content, bytes) else memoryview(content)
+
+    def _map(self):
+        with open(self.path, "rb") as f:
+            try:
+                return _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            except ValueError:  # Empty files can not be mapped.
+                return b""
+
+
+# Bytes gathered before each write to a bare socket.
+_SEND_BUFFER = 64 * 1024
+
+
+class _MappedFile(_mmap.mmap):
+    # Keeps the file it maps open, so it can be used with sendfile.
+    fd = None
+    path = None
+    mtime = None
+    digest = None
+
+
+class _EmptyFile(bytes):
+    # Stands in for a mapping of an empty file, which mmap refuses.
+    path = None
+    mtime = None
+    digest = None
+
+
+def _socket_fileno(sink):
+    if isinstance(sink, _socket.socket):
+        return sink.fileno()
+    raw = getattr(sink, "raw", None)
+    if isinstance(raw, _socket.SocketIO):
+        return sink.fileno()
+    return None
+
+
+def _sendfile(out_fd, in_fd, count):
+    offset = 0
+    while offset < count:
+        sent = _os.sendfile(out_fd, in_fd, offset, count - offset)
+        if not sent:
+            raise EOFError("File was truncated while sending.")
+        offset += sent
+
+
+class Include(Raw):
+    """
+    Include a static file, such as a vendored script or stylesheet, verbatim.
+
+    Files are memory-mapped once per process and remapped only when their
+    mtime changes, so rendering costs a `stat()` and never copies the bytes.
+    """
+
+    _cache = {}
+
+    def __init__(self, path):
+        super(Include, self).__init__(path=path)
+
+    @property
+    def digest(self):
+        """Content hash of the included file, handy as an ETag version key."""
+        return self._map().digest
+
+    def _map(self):
+        path = _os.path.abspath(self.path)
+        mtime = _os.stat(path).st_mtime_ns
+        mapped = self._cache.get(path)
+        if mapped is not None and mapped.mtime == mtime:
+            return mapped
+        fd = _os.open(path, _os.O_RDONLY)
+        try:
+            mapped = _MappedFile(fd, 0, access=_mmap.ACCESS_READ)
+        except ValueError:  # Empty files can not be mapped, like Raw(path=...).
+            _os.close(fd)
+            mapped = _EmptyFile()
+        except BaseException:
+            _os.close(fd)
+            raise
+        else:
+            # The descriptor lives as long as the mapping, for sendfile.
+            mapped.fd = fd
+            _weakref.finalize(mapped, _os.close, fd)
+        digest = new_hash()
+        digest.update(mapped)
+        mapped.path, mapped.mtime, mapped.digest = path, mtime, digest.hexdigest()
+        self._cache[path] = mapped
+        return mapped
 
 
 class Tag(object):
     def __init__(self, _name, *elements, close=True, **attrs):
+        doc = get_local_variable_from_caller("doc", Doc)
         self.name = _name or ""
-        if _name in defaults.deprecated_tags:
-            _warnings.warn(f"The {_name} tag is deprecated.")
-        self.attrs = {fix_attribute(k): v for k, v in attrs.items()}
-        self.elements = [e for e in elements if self.validate(_name, e)]
+        if doc._validate:
+            if _name in defaults.deprecated_tags:
+                _warnings.warn(f"The {_name} tag is deprecated.")
+            self.elements = [e for e in elements if self.validate(_name, e)]
+        else:
+            self.elements = [e for e in elements if e is not None]
+        if doc.profile is None:
+            self.attrs = {fix_attribute(k): v for k, v in attrs.items()}
+        else:
+            translate = doc.profile.attribute
+            self.attrs = {translate(k): v for k, v in attrs.items()}
+        _class_list(self.attrs)
         self.close = close
-        doc = get_local_variable_from_caller("doc", Doc)
+        if doc._strict:
+            _check_nesting(self, self.elements)
         if doc.elements and elements:
             if doc.elements[-1] == elements[0]:
                 doc.elements.pop()
         doc.elements.append(self)
+        doc._version += 1
+
+    @classmethod
+    def detached(cls, _name, *elements, close=True, **attrs):
+        """
+        Create a tag without adding it to the caller's Doc,
+        such as a node built once and shared by many documents.
+        """
+        tag = cls.__new__(cls)
+        tag.name = _name or ""
+        tag.elements = [e for e in elements if tag.validate(_name, e)]
+        tag.attrs = _class_list({fix_attribute(k): v for k, v in attrs.items()})
+        tag.close = close
+        return tag
 
     def __str__(self):
-        name = self.name
-        attrs = "".join(
-            [
-                ' {}="{}"'.format(k, v)
-                for k, v in self.attrs.items()
-                if not isinstance(v, bool)
-            ]
-        )
-        # Handle boolean attributes separately.
-        attrs += "".join(
-            [" {}".format(k) for k, v in self.attrs.items() if isinstance(v, bool)]
-        )
-        if not self.close:
-            _tag = "<{name}{attrs} />".format(name=name, attrs=attrs)
-            return _tag
-        _begin = "<{name}{attrs}>".format(name=name, attrs=attrs)
-        _children = "".join([str(c) for c in self.elements if c])
-        _end = "</{name}>".format(name=name)
-        return _begin + _children + _end
+        return "".join(_text(self._chunks()))
+
+    def _attrs(self):
+        return _format_attrs(self.attrs)
+
+    def _chunks(self, profile=None):
+        begin, end = _tag_parts(self.name, self.attrs, self.close, profile)
+        yield begin
+        if end is None:
+            return
+        for c in self.elements:
+            if c:
+                yield from _iter_chunks(c, profile)
+        yield end
 
     def __enter__(self, **elements):
         doc = get_local_variable_from_caller("doc", Doc)
@@ -75,18 +696,29 @@ class Tag(object):
         doc = get_local_variable_from_caller("doc", Doc)
         doc.parent = self.parent
         doc.elements, self.elements = self.backup, doc.elements
+        if doc._strict and exc_type is None:
+            _check_nesting(self, self.elements)
 
     def validate(self, _name, element):
         if element is None:
             return False
-        elif isinstance(element, (str, Tag, Doc)):
+        elif isinstance(element, (str, Tag, Doc, Raw)):
             return True
         raise TypeError(
             "Validation failed for element {!r}: {!r}, "
-            "expected str, Tag or Doc.".format(_name, element)
+            "expected str, Tag, Doc or Raw.".format(_name, element)
         )
 
 
+class _Root(object):
+    # Stands in for the implicit <html> parent of a full document.
+    name = "html"
+    close = True
+
+
+_ROOT = _Root()
+
+
 class VoidTag(Tag):
     """
     https://html.spec.whatwg.org/multipage/syntax.html#void-elements
@@ -95,6 +727,10 @@ class VoidTag(Tag):
     def __init__(self, _name, *elements, **attrs):
         super(VoidTag, self).__init__(_name, *elements, close=False, **attrs)
 
+    @classmethod
+    def detached(cls, _name, *elements, **attrs):
+        return super(VoidTag, cls).detached(_name, *elements, close=False, **attrs)
+
 
 class Text(Tag):
     def __init__(self, text):
@@ -104,6 +740,9 @@ class Text(Tag):
     def __str__(self):
         return self.text
 
+    def _chunks(self, profile=None):
+        yield self.text
+
 
 html = _partial(Tag, "html")
 head = _partial(Tag, "head")
@@ -264,6 +903,135 @@ strike = _partial(Tag, "strike")
 tt = _partial(Tag, "tt")
 xmp = _partial(Tag, "xmp")
 
+
+Page = _namedtuple("Page", ["cursor", "next", "prev", "count"])
+
+
+def encode_cursor(offset):
+    """Return an opaque, URL-safe cursor for `offset`."""
+    return _base64.urlsafe_b64encode(str(offset).encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor):
+    """Return the offset encoded in `cursor`, 0 for an empty cursor."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(_base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor: {!r}".format(cursor))
+    if offset < 0:
+        raise ValueError("Invalid cursor: {!r}".format(cursor))
+    return offset
+
+
+def encode_key_cursor(key):
+    """Return an opaque, URL-safe cursor for a JSON-compatible sort key."""
+    data = _json.dumps(key, separators=(",", ":")).encode()
+    return "k" + _base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_key_cursor(cursor):
+    """Return the key encoded in `cursor`, None for an empty cursor."""
+    if not cursor:
+        return None
+    try:
+        if not cursor.startswith("k"):
+            raise ValueError(cursor)
+        padded = cursor[1:] + "=" * (-len(cursor[1:]) % 4)
+        return _json.loads(_base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor: {!r}".format(cursor))
+
+
+def _page_url(endpoint, cursor, fragment=False):
+    url = "{}{}cursor={}".format(endpoint, "&" if "?" in endpoint else "?", cursor)
+    return url + "&fragment=1" if fragment else url
+
+
+def paged_list(
+    iterable,
+    page_size,
+    render_item,
+    cursor=None,
+    endpoint=None,
+    container=ul,
+    key=None,
+    **attrs,
+):
+    """
+    Render one page of `iterable` into the caller's Doc, returns a Page.
+
+    `render_item(item)` adds an item to the doc (or returns a Doc or str
+    to add) inside `container(**attrs)`. Only `page_size` items (plus one,
+    to see whether there is a next page) are taken from `iterable`;
+    when it is a callable it is called as `iterable(offset, limit)`,
+    so a database can do the paging. A sequence is sliced, but a plain
+    iterator is walked from the start, so each page costs O(offset).
+
+    For deep pages pass `key`, a function returning the JSON-compatible
+    sort key of an item, and a callable `iterable(start_after, limit)`
+    returning the items after that key (all items for None), such as
+    `WHERE topic > ? ORDER BY topic LIMIT ?`. The cursor then holds the
+    key of the last item shown, so every page costs the same.
+    Keyset pages have no previous link.
+
+    With an `endpoint`, previous/next links to `endpoint?cursor=...` are
+    added, and the container carries `data-next` and `data-fragment`
+    URLs (`...&fragment=1`) for fetching just the following page.
+    """
+    if page_size < 1:
+        raise ValueError("Expected page_size >= 1, got: {!r}".format(page_size))
+    doc = get_local_variable_from_caller("doc", Doc)
+    if key is not None:
+        if not callable(iterable):
+            raise TypeError("Keyset paging needs a callable iterable.")
+        window = list(iterable(decode_key_cursor(cursor), page_size + 1))
+        items = window[:page_size]
+        more = len(window) > page_size and items
+        page = Page(
+            cursor=cursor or None,
+            next=encode_key_cursor(key(items[-1])) if more else None,
+            prev=None,
+            count=len(items),
+        )
+        return _render_page(doc, page, items, render_item, endpoint, container, attrs)
+    offset = decode_cursor(cursor)
+    if callable(iterable):
+        window = list(iterable(offset, page_size + 1))
+    elif hasattr(iterable, "__getitem__") and hasattr(iterable, "__len__"):
+        window = list(iterable[offset : offset + page_size + 1])
+    else:
+        window = list(_islice(iterable, offset, offset + page_size + 1))
+    items = window[:page_size]
+    page = Page(
+        cursor=encode_cursor(offset),
+        next=encode_cursor(offset + page_size) if len(window) > page_size else None,
+        prev=encode_cursor(max(0, offset - page_size)) if offset else None,
+        count=len(items),
+    )
+    return _render_page(doc, page, items, render_item, endpoint, container, attrs)
+
+
+def _render_page(doc, page, items, render_item, endpoint, container, attrs):
+    if endpoint is not None and page.next is not None:
+        attrs.setdefault("data_next", _page_url(endpoint, page.next))
+        attrs.setdefault("data_fragment", _page_url(endpoint, page.next, True))
+    with container(**attrs):
+        for item in items:
+            rendered = render_item(item)
+            if isinstance(rendered, (Doc, str)):
+                doc.elements.append(rendered)
+    if endpoint is not None and (page.prev or page.next):
+        with nav(cls="paged-list-nav"):
+            if page.prev is not None:
+                a("Previous", rel="prev", href=_page_url(endpoint, page.prev))
+            if page.next is not None:
+                a("Next", rel="next", href=_page_url(endpoint, page.next))
+    return page
+
+
 __all__ = [
     # Tags
     "html",
@@ -50,6 +50,7 @@ class JS(object):
     def embed(self):
         doc = get_local_variable_from_caller("doc", Doc)
         doc.elements.append(self)
+        doc._version += 1
 
 
 class javascript_module:
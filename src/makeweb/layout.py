@@ -0,0 +1,112 @@
+"""
+Page skeletons that are serialized once and filled per request.
+
+Build the skeleton like any other document, marking the changing parts
+with `slot(name)`, and wrap it in a Layout:
+
+    def skeleton():
+        doc = Doc("html")
+        with head():
+            title(slot("title"))
+        with body():
+            slot("content")
+        return doc
+
+    base = Layout(skeleton())
+    base.render(title="Home", content=render_content(topic))
+
+The skeleton is rendered to bytes once, per request only the slots are
+rendered. Heads-up: `slot` here shadows the `<slot>` tag of makeweb.html.
+"""
+
+import contextvars as _contextvars
+
+from .html import Raw, _encoded, _iter_chunks
+
+# Set while a Layout splits its skeleton, so slots yield themselves.
+_splitting = _contextvars.ContextVar("makeweb_layout_splitting", default=False)
+
+
+class Slot(Raw):
+    """
+    Named placeholder, renders `default` unless it is filled by a Layout.
+    """
+
+    def __init__(self, name, default=""):
+        self.name = name
+        super(Slot, self).__init__(default)
+
+    def _chunks(self, profile=None):
+        if _splitting.get():
+            yield self
+        else:
+            yield from super(Slot, self)._chunks(profile)
+
+
+slot = Slot
+
+
+class Layout(object):
+    """
+    Skeleton `doc` split into static bytes and named slots.
+
+    Slots can be filled with str, bytes, Doc, Tag or Raw values,
+    or with callables returning one of those, which are only called
+    once the part of the page before them has been streamed.
+    """
+
+    def __init__(self, doc):
+        self.profile = doc.profile
+        self.segments = []
+        # Rendered defaults, by position of the slot in `segments`.
+        self._defaults = {}
+        static = []
+        token = _splitting.set(True)
+        try:
+            for chunk in doc._chunks():
+                if isinstance(chunk, Slot):
+                    self.segments.append(b"".join(_encoded(static)))
+                    self._defaults[len(self.segments)] = b"".join(
+                        _encoded(Raw._chunks(chunk))
+                    )
+                    self.segments.append(chunk.name)
+                    static = []
+                else:
+                    static.append(chunk)
+        finally:
+            _splitting.reset(token)
+        self.segments.append(b"".join(_encoded(static)))
+        self.slots = tuple(dict.fromkeys(self.segments[1::2]))
+
+    def _fill(self, value):
+        if callable(value) and not hasattr(value, "_chunks"):
+            value = value()
+        if value is None:
+            return ()
+        if isinstance(value, (str, bytes)):
+            return (value.encode("utf-8") if isinstance(value, str) else value,)
+        return _encoded(_iter_chunks(value, self.profile))
+
+    def stream(self, **fills):
+        """
+        Yield the page as UTF-8 encoded chunks, starting with the
+        static prefix before any fill is rendered.
+        """
+        unknown = set(fills).difference(self.slots)
+        if unknown:
+            raise TypeError("Unknown slots: {}".format(", ".join(sorted(unknown))))
+        for n, segment in enumerate(self.segments):
+            if n % 2 == 0:
+                if segment:
+                    yield segment
+            elif segment in fills:
+                yield from self._fill(fills[segment])
+            elif self._defaults[n]:
+                yield self._defaults[n]
+
+    def render_bytes(self, **fills):
+        return b"".join(self.stream(**fills))
+
+    def render(self, **fills):
+        """Return the filled page as a str."""
+        return self.render_bytes(**fills).decode("utf-8")
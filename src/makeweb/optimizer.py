@@ -0,0 +1,608 @@
+"""
+Stylesheet optimizer used by `CSS.optimize()`.
+
+Rules are parsed back from the serialized form kept in `CSS.style`, then:
+
+    - rules with identical selectors are merged,
+    - overridden declarations are dropped,
+    - selectors with identical bodies are grouped,
+    - colors, zero lengths, leading zeros and commas are shortened,
+    - `@media` blocks with the same query are coalesced.
+
+Rules are only moved up to an earlier rule when no rule in between
+sets a related property, a shorthand and its longhands being related,
+so the cascade is never changed. Unknown properties are related to all.
+Anything that can not be parsed is kept verbatim and nothing moves across it.
+
+`shake()` keeps only the rules that could match a given set of
+tag names, ids and classes, see `CSS.for_doc()`.
+"""
+
+import re as _re
+from collections import namedtuple as _namedtuple
+
+_HEX = _re.compile(
+    r"#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3(?![0-9a-fA-F])"
+    r"|#[0-9a-fA-F]{3,8}\b"
+)
+_ZERO = _re.compile(
+    r"(?<![\w.#-])(?:0?\.)?0+(?:px|em|rem|ex|ch|vh|vw|vmin|vmax|pt|pc|cm|mm|in|q)\b"
+)
+_LEADING_ZERO = _re.compile(r"(?<![\w.])0+\.(?=\d)")
+_COMMA = _re.compile(r"\s*,\s*")
+# Quoted strings and url() contents, which are never shortened.
+_VERBATIM = _re.compile(r"('[^']*'|\"[^\"]*\"|url\([^)]*\))", _re.IGNORECASE)
+_SELECTOR_ARGS = _re.compile(r"\([^()]*\)|\[[^\]]*\]")
+_COMBINATOR = _re.compile(r"\s*[>+~]\s*|\s+")
+_SELECTOR_TAG = _re.compile(r"[A-Za-z][\w-]*")
+_SELECTOR_PARTS = _re.compile(r"([#.])(-?[_A-Za-z][\w-]*)")
+# At-rules that hold no style rules, they never interact with the cascade.
+_INERT = ("@keyframes", "@-webkit-keyframes", "@font-face", "@page", "@property")
+
+
+# Standard CSS properties.
+_PROPERTIES = """
+accent-color align-content align-items align-self all animation animation-composition
+animation-delay animation-direction animation-duration animation-fill-mode
+animation-iteration-count animation-name animation-play-state animation-timing-function
+appearance aspect-ratio backdrop-filter backface-visibility background
+background-attachment background-blend-mode background-clip background-color
+background-image background-origin background-position background-position-x
+background-position-y background-repeat background-size block-size border
+border-block border-block-color border-block-end border-block-start border-block-style
+border-block-width border-bottom border-bottom-color border-bottom-left-radius
+border-bottom-right-radius border-bottom-style border-bottom-width border-collapse
+border-color border-end-end-radius border-end-start-radius border-image
+border-image-outset border-image-repeat border-image-slice border-image-source
+border-image-width border-inline border-inline-color border-inline-end
+border-inline-start border-inline-style border-inline-width border-left
+border-left-color border-left-style border-left-width border-radius border-right
+border-right-color border-right-style border-right-width border-spacing
+border-start-end-radius border-start-start-radius border-style border-top
+border-top-color border-top-left-radius border-top-right-radius border-top-style
+border-top-width border-width bottom box-decoration-break box-shadow box-sizing
+break-after break-before break-inside caption-side caret-color clear clip clip-path
+color color-scheme column-count column-fill column-gap column-rule column-rule-color
+column-rule-style column-rule-width column-span column-width columns contain
+container container-name container-type content content-visibility counter-increment
+counter-reset counter-set cursor direction display empty-cells filter flex flex-basis
+flex-direction flex-flow flex-grow flex-shrink flex-wrap float font font-display
+font-family font-feature-settings font-kerning font-language-override
+font-optical-sizing font-size font-size-adjust font-stretch font-style font-synthesis
+font-variant font-variant-caps font-variant-east-asian font-variant-ligatures
+font-variant-numeric font-variation-settings font-weight gap grid grid-area
+grid-auto-columns grid-auto-flow grid-auto-rows grid-column grid-column-end
+grid-column-gap grid-column-start grid-gap grid-row grid-row-end grid-row-gap
+grid-row-start grid-template grid-template-areas grid-template-columns
+grid-template-rows hanging-punctuation height hyphens image-rendering inline-size
+inset inset-block inset-block-end inset-block-start inset-inline inset-inline-end
+inset-inline-start isolation justify-content justify-items justify-self left
+letter-spacing line-break line-clamp line-height list-style list-style-image
+list-style-position list-style-type margin margin-block margin-block-end
+margin-block-start margin-bottom margin-inline margin-inline-end margin-inline-start
+margin-left margin-right margin-top mask mask-clip mask-composite mask-image mask-mode
+mask-origin mask-position mask-repeat mask-size mask-type max-block-size max-height
+max-inline-size max-width min-block-size min-height min-inline-size min-width
+mix-blend-mode object-fit object-position offset offset-distance offset-path
+offset-rotate opacity order orphans outline outline-color outline-offset outline-style
+outline-width overflow overflow-anchor overflow-wrap overflow-x overflow-y
+overscroll-behavior overscroll-behavior-x overscroll-behavior-y padding padding-block
+padding-block-end padding-block-start padding-bottom padding-inline padding-inline-end
+padding-inline-start padding-left padding-right padding-top page-break-after
+page-break-before page-break-inside perspective perspective-origin place-content
+place-items place-self pointer-events position print-color-adjust quotes resize right
+rotate row-gap scale scroll-behavior scroll-margin scroll-margin-bottom
+scroll-margin-left scroll-margin-right scroll-margin-top scroll-padding
+scroll-padding-bottom scroll-padding-left scroll-padding-right scroll-padding-top
+scroll-snap-align scroll-snap-stop scroll-snap-type scrollbar-color scrollbar-gutter
+scrollbar-width shape-outside tab-size table-layout text-align text-align-last
+text-combine-upright text-decoration text-decoration-color text-decoration-line
+text-decoration-skip-ink text-decoration-style text-decoration-thickness
+text-emphasis text-indent text-justify text-orientation text-overflow text-rendering
+text-shadow text-size-adjust text-stroke text-transform text-underline-offset
+text-underline-position text-wrap top touch-action transform transform-box
+transform-origin transform-style transition transition-delay transition-duration
+transition-property transition-timing-function translate unicode-bidi user-select
+vertical-align visibility white-space widows width will-change word-break
+word-spacing word-wrap writing-mode z-index zoom""".split()
+
+_SIDES = ("top", "right", "bottom", "left")
+_CORNERS = ("top-left", "top-right", "bottom-right", "bottom-left")
+_LOGICAL = ("block", "block-start", "block-end", "inline", "inline-start", "inline-end")
+
+
+def _box(prefix, suffix=""):
+    return ["{}-{}{}".format(prefix, side, suffix) for side in _SIDES]
+
+
+# Shorthands and the longhands they set. Logical properties are listed
+# as setting every physical side, as that depends on the writing mode.
+_SHORTHANDS = {
+    "animation": [
+        "animation-name",
+        "animation-duration",
+        "animation-timing-function",
+        "animation-delay",
+        "animation-iteration-count",
+        "animation-direction",
+        "animation-fill-mode",
+        "animation-play-state",
+        "animation-composition",
+    ],
+    "background": [
+        "background-attachment",
+        "background-clip",
+        "background-color",
+        "background-image",
+        "background-origin",
+        "background-position",
+        "background-repeat",
+        "background-size",
+    ],
+    "background-position": ["background-position-x", "background-position-y"],
+    "border": ["border-width", "border-style", "border-color", "border-image"]
+    + _box("border"),
+    "border-width": _box("border", "-width"),
+    "border-style": _box("border", "-style"),
+    "border-color": _box("border", "-color"),
+    "border-image": [
+        "border-image-source",
+        "border-image-slice",
+        "border-image-width",
+        "border-image-outset",
+        "border-image-repeat",
+    ],
+    "border-radius": ["border-{}-radius".format(c) for c in _CORNERS],
+    "column-rule": ["column-rule-width", "column-rule-style", "column-rule-color"],
+    "columns": ["column-width", "column-count"],
+    "container": ["container-name", "container-type"],
+    "flex": ["flex-grow", "flex-shrink", "flex-basis"],
+    "flex-flow": ["flex-direction", "flex-wrap"],
+    "font": [
+        "font-style",
+        "font-variant",
+        "font-weight",
+        "font-stretch",
+        "font-size",
+        "line-height",
+        "font-family",
+        "font-size-adjust",
+        "font-kerning",
+        "font-language-override",
+        "font-optical-sizing",
+        "font-variation-settings",
+        "font-feature-settings",
+    ],
+    "font-variant": [
+        "font-variant-caps",
+        "font-variant-east-asian",
+        "font-variant-ligatures",
+        "font-variant-numeric",
+        "font-variant-alternates",
+        "font-variant-position",
+    ],
+    "gap": ["row-gap", "column-gap"],
+    "grid": [
+        "grid-template",
+        "grid-auto-rows",
+        "grid-auto-columns",
+        "grid-auto-flow",
+        "row-gap",
+        "column-gap",
+    ],
+    "grid-template": [
+        "grid-template-rows",
+        "grid-template-columns",
+        "grid-template-areas",
+    ],
+    "grid-area": ["grid-row", "grid-column"],
+    "grid-row": ["grid-row-start", "grid-row-end"],
+    "grid-column": ["grid-column-start", "grid-column-end"],
+    "inset": list(_SIDES),
+    "list-style": ["list-style-type", "list-style-position", "list-style-image"],
+    "margin": _box("margin"),
+    "mask": [
+        "mask-image",
+        "mask-mode",
+        "mask-repeat",
+        "mask-position",
+        "mask-clip",
+        "mask-origin",
+        "mask-size",
+        "mask-composite",
+    ],
+    "offset": [
+        "offset-position",
+        "offset-path",
+        "offset-distance",
+        "offset-rotate",
+        "offset-anchor",
+    ],
+    "outline": ["outline-color", "outline-style", "outline-width"],
+    "overflow": ["overflow-x", "overflow-y"],
+    "overscroll-behavior": ["overscroll-behavior-x", "overscroll-behavior-y"],
+    "padding": _box("padding"),
+    "place-content": ["align-content", "justify-content"],
+    "place-items": ["align-items", "justify-items"],
+    "place-self": ["align-self", "justify-self"],
+    "scroll-margin": _box("scroll-margin"),
+    "scroll-padding": _box("scroll-padding"),
+    "text-decoration": [
+        "text-decoration-line",
+        "text-decoration-style",
+        "text-decoration-color",
+        "text-decoration-thickness",
+    ],
+    "transition": [
+        "transition-property",
+        "transition-duration",
+        "transition-timing-function",
+        "transition-delay",
+    ],
+}
+for _side in _SIDES:
+    _SHORTHANDS["border-" + _side] = [
+        "border-{}-{}".format(_side, part) for part in ("width", "style", "color")
+    ]
+for _prefix in ("margin", "padding", "scroll-margin", "scroll-padding", "inset"):
+    for _part in _LOGICAL:
+        _SHORTHANDS["{}-{}".format(_prefix, _part)] = _SHORTHANDS[_prefix]
+for _part in _LOGICAL:
+    _SHORTHANDS["border-" + _part] = _SHORTHANDS["border-width"] + [
+        "border-{}-{}".format(_side, p) for _side in _SIDES for p in ("style", "color")
+    ]
+    for _kind in ("width", "style", "color"):
+        _SHORTHANDS["border-{}-{}".format(_part, _kind)] = _SHORTHANDS[
+            "border-" + _kind
+        ]
+for _corner in ("start-start", "start-end", "end-start", "end-end"):
+    _SHORTHANDS["border-{}-radius".format(_corner)] = _SHORTHANDS["border-radius"]
+for _size in ("", "min-", "max-"):
+    for _logical in ("block-size", "inline-size"):
+        _SHORTHANDS[_size + _logical] = [_size + "width", _size + "height"]
+# Legacy names that are the same property as a standard one.
+_ALIASES = {
+    "grid-gap": "gap",
+    "grid-row-gap": "row-gap",
+    "grid-column-gap": "column-gap",
+    "word-wrap": "overflow-wrap",
+    "page-break-after": "break-after",
+    "page-break-before": "break-before",
+    "page-break-inside": "break-inside",
+}
+
+
+def _expand(prop, found):
+    found.add(prop)
+    for longhand in _SHORTHANDS.get(prop, ()):
+        if longhand not in found:
+            _expand(longhand, found)
+    return found
+
+
+_LONGHANDS = {}
+for _prop in set(_PROPERTIES) | set(_SHORTHANDS):
+    _LONGHANDS[_prop] = frozenset(_expand(_prop, set()))
+for _longhands in list(_SHORTHANDS.values()):
+    for _prop in _longhands:
+        _LONGHANDS.setdefault(_prop, frozenset((_prop,)))
+# `all` resets everything but direction, unicode-bidi and custom properties.
+_LONGHANDS["all"] = frozenset(_LONGHANDS) - {"direction", "unicode-bidi"}
+del _side, _prefix, _part, _kind, _corner, _size, _logical, _prop, _longhands
+
+
+class Savings(_namedtuple("Savings", ["before", "after"])):
+    """Stylesheet size in UTF-8 bytes before and after optimizing."""
+
+    @property
+    def saved(self):
+        return self.before - self.after
+
+
+def _split(text, separator):
+    # Split on `separator` outside quotes and parentheses.
+    parts, start, depth, quote = [], 0, 0, None
+    for n, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and not depth:
+            parts.append(text[start:n])
+            start = n + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _closing(text, start):
+    # Index of the brace closing the one at `start`, or -1.
+    depth, quote = 0, None
+    for n in range(start, len(text)):
+        char = text[n]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if not depth:
+                return n
+    return -1
+
+
+def _declarations(body):
+    decls = []
+    for part in _split(body, ";"):
+        prop, sep, value = part.partition(":")
+        if sep and prop.strip():
+            decls.append((prop.strip(), value.strip()))
+    return decls
+
+
+def parse(text):
+    """
+    Parse serialized rules into a list of items:
+    `["rule", selector, declarations]`, `["media", query, items]`
+    and `["raw", text, inert]`.
+    """
+    items, position = [], 0
+    while position < len(text):
+        if text[position] in " \t\r\n;":
+            position += 1
+            continue
+        opening = text.find("{", position)
+        closing = _closing(text, opening) if opening != -1 else -1
+        if closing == -1:
+            items.append(["raw", text[position:].strip(), False])
+            break
+        prelude = text[position:opening].strip()
+        body = text[opening + 1 : closing]
+        if prelude.startswith("@media"):
+            items.append(["media", prelude, parse(body)])
+        elif prelude.startswith("@"):
+            inert = prelude.startswith(_INERT)
+            items.append(["raw", text[position : closing + 1], inert])
+        else:
+            items.append(["rule", prelude, _declarations(body)])
+        position = closing + 1
+    return items
+
+
+def serialize(items):
+    out = []
+    for item in items:
+        if item[0] == "rule":
+            body = ";".join("{}:{}".format(k, v) for k, v in item[2])
+            out.append("{}{{{}}}".format(item[1], body))
+        elif item[0] == "media":
+            out.append("{}{{{}}}".format(item[1], ";".join(serialize(item[2]))))
+        else:
+            out.append(item[1])
+    return out
+
+
+def _minify_value(prop, value):
+    # Custom properties may end up anywhere, such as inside calc().
+    if "calc(" in value or prop.startswith("--"):
+        return value
+    parts = _VERBATIM.split(value)
+    for n in range(0, len(parts), 2):
+        part = _HEX.sub(_short_hex, parts[n])
+        part = _ZERO.sub("0", part)
+        part = _LEADING_ZERO.sub(".", part)
+        parts[n] = _COMMA.sub(",", part)
+    return "".join(parts)
+
+
+def _short_hex(match):
+    if match.group(1):
+        return "#" + (match.group(1) + match.group(2) + match.group(3)).lower()
+    return match.group(0).lower()
+
+
+def _vendor(value):
+    return value.startswith("-")
+
+
+def _dedupe(decls):
+    out = []
+    for prop, value in decls:
+        keep = True
+        for n, (p, v) in enumerate(out):
+            if p != prop:
+                continue
+            if v == value or not (_vendor(v) or _vendor(value)):
+                if v.endswith("!important") and not value.endswith("!important"):
+                    keep = False
+                else:
+                    del out[n]
+                break
+        if keep:
+            out.append((prop, value))
+    return out
+
+
+def _name(prop):
+    # Lower case, without a vendor prefix and with legacy aliases resolved.
+    prop = prop.lower()
+    if prop.startswith("-") and not prop.startswith("--"):
+        prop = prop.split("-", 2)[-1]
+    return _ALIASES.get(prop, prop)
+
+
+def _sets(prop):
+    """
+    Properties set by a declaration of `prop`, the property itself and
+    all of its longhands. None when `prop` is not known.
+    """
+    if prop.startswith("--"):
+        return {prop}  # Custom properties only interact with themselves.
+    return _LONGHANDS.get(_name(prop))
+
+
+def _properties(item):
+    """Properties set by `item`, None when any of them is unknown."""
+    if item[0] == "rule":
+        properties = set()
+        for prop, _ in item[2]:
+            found = _sets(prop)
+            if found is None:
+                return None
+            properties |= found
+        return properties
+    if item[0] == "media":
+        properties = set()
+        for inner in item[2]:
+            found = _properties(inner)
+            if found is None:
+                return None
+            properties |= found
+        return properties
+    return set() if item[2] else None
+
+
+def _interact(first, second):
+    # A shorthand and its longhands set the same properties:
+    # margin and margin-top, font and line-height, but not font-size and color.
+    return not first.isdisjoint(second)
+
+
+def _can_move(properties, start, end, moved):
+    # Moving item `end` up to `start` is safe when nothing in between
+    # sets a related property, `properties` holding those of every item.
+    if moved is None:
+        return False
+    for between in properties[start + 1 : end]:
+        if between is None or _interact(between, moved):
+            return False
+    return True
+
+
+def _merge(items, kind, key, combine):
+    # Each item is only combined with the last earlier one with the same key.
+    out, properties, last = [], [], {}
+    for item in items:
+        found = _properties(item)
+        if item[0] == kind:
+            k = key(item)
+            n = last.get(k)
+            if n is not None and _can_move(properties, n, len(out), found):
+                combine(out[n], item)
+                properties[n] = _properties(out[n])
+                continue
+            last[k] = len(out)
+        out.append(item)
+        properties.append(found)
+    return out
+
+
+def _groupable(selector):
+    # One unsupported vendor selector would drop the whole group.
+    return ":-" not in selector
+
+
+def optimize_items(items):
+    for item in items:
+        if item[0] == "rule":
+            item[2] = _dedupe([(p, _minify_value(p, v)) for p, v in item[2]])
+        elif item[0] == "media":
+            item[2] = optimize_items(item[2])
+
+    def merge_rules(first, second):
+        first[2] = _dedupe(first[2] + second[2])
+
+    def merge_media(first, second):
+        first[2] = optimize_items(first[2] + second[2])
+
+    def group(first, second):
+        first[1] = "{},{}".format(first[1], second[1])
+
+    items = [i for i in items if i[0] != "rule" or i[2]]
+    items = _merge(items, "rule", lambda i: i[1], merge_rules)
+    items = _merge(items, "media", lambda i: i[1], merge_media)
+    return _merge(
+        items,
+        "rule",
+        lambda i: serialize([["rule", "", i[2]]])[0] if _groupable(i[1]) else id(i),
+        group,
+    )
+
+
+def optimize(style):
+    """Return the optimized form of the serialized rules in `style`."""
+    return serialize(optimize_items(parse("".join(style))))
+
+
+def could_match(selector, tags, ids, classes):
+    """
+    Return False when `selector` needs a tag name, id or class
+    that is not in `tags`, `ids` or `classes`.
+    """
+    for part in _split(selector, ","):
+        if "\\" in part:
+            return True  # Escaped names are not worth parsing.
+        # Arguments of :not(), :is() and attribute values never rule out a match.
+        previous = None
+        while previous != part:
+            previous, part = part, _SELECTOR_ARGS.sub("", part)
+        for compound in _COMBINATOR.split(part.strip()):
+            tag = _SELECTOR_TAG.match(compound)
+            if tag and tag.group(0).lower() not in tags:
+                break
+            if any(
+                name not in (ids if kind == "#" else classes)
+                for kind, name in _SELECTOR_PARTS.findall(compound)
+            ):
+                break
+        else:
+            return True
+    return False
+
+
+def shake(items, tags, ids, classes):
+    """
+    Return the items whose selectors could match, dropping emptied
+    `@media` blocks and keyframes no kept rule refers to.
+    """
+    kept = []
+    for item in items:
+        if item[0] == "rule":
+            if could_match(item[1], tags, ids, classes):
+                kept.append(item)
+        elif item[0] == "media":
+            inner = shake(item[2], tags, ids, classes)
+            if inner:
+                kept.append(["media", item[1], inner])
+        else:
+            kept.append(item)
+    values = " ".join(v for i in _rules(kept) for _, v in i[2])
+    used = set(_re.findall(r"[\w-]+", values))
+    out = []
+    for item in kept:
+        name = _keyframes(item[1]) if item[0] == "raw" else None
+        if name is None or name in used:
+            out.append(item)
+    return out
+
+
+def _rules(items):
+    for item in items:
+        if item[0] == "rule":
+            yield item
+        elif item[0] == "media":
+            yield from _rules(item[2])
+
+
+def _keyframes(text):
+    # Name of a @keyframes block, or None for other raw items.
+    if not text.startswith(("@keyframes", "@-webkit-keyframes")):
+        return None
+    return text[: text.index("{")].split()[1]
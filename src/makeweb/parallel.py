@@ -0,0 +1,222 @@
+"""
+Serialize very large documents with several workers.
+
+The tree is split into independent subtrees that are serialized
+by worker processes (or threads on free-threaded Python builds)
+and joined back in document order.
+
+Worker processes are forked once and kept for later renders, the subtrees
+are packed into plain tuples and sent to them. Call `start()` at startup,
+before the application starts any threads: forking a process that runs
+threads may leave the workers deadlocked on a lock held by another thread,
+so `Doc.render(parallel=N)` should not be used from multithreaded servers
+without it. Where processes can not be forked, and for documents with
+fewer than `MIN_NODES` nodes, the document is rendered serially: sending
+work to workers costs more than it saves there,
+see benchmarks/bench_parallel.py.
+"""
+
+import atexit as _atexit
+import multiprocessing as _multiprocessing
+import os as _os
+import sys as _sys
+import threading as _threading
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from itertools import repeat as _repeat
+
+from .html import Tag, Text, VoidTag, _iter_chunks, _tag_parts, _text
+
+# Subtrees handed out per worker, more pieces balance uneven subtrees better.
+PIECES_PER_WORKER = 4
+# Smaller documents are rendered serially.
+MIN_NODES = 20000
+
+# Worker pools by kind and number of workers.
+_pools = {}
+_pools_lock = _threading.Lock()
+
+
+def _forget_pools():
+    # The workers belong to the parent process, a forked child starts its own.
+    _pools.clear()
+
+
+if hasattr(_os, "register_at_fork"):
+    _os.register_at_fork(after_in_child=_forget_pools)
+
+
+def free_threaded():
+    """Return True on Python builds running without the GIL."""
+    is_gil_enabled = getattr(_sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _executor(workers):
+    with _pools_lock:
+        pool = _pools.get(("thread", workers))
+        if pool is None:
+            pool = _pools["thread", workers] = _ThreadPoolExecutor(workers)
+        return pool
+
+
+def _fork_context():
+    try:
+        return _multiprocessing.get_context("fork")
+    except ValueError:  # pragma: no cover
+        return None
+
+
+def _process_pool(workers):
+    context = _fork_context()
+    if context is None:  # pragma: no cover
+        return None
+    with _pools_lock:
+        pool = _pools.get(("fork", workers))
+        if pool is None:
+            pool = _ProcessPoolExecutor(workers, mp_context=context)
+            _pools["fork", workers] = pool
+        return pool
+
+
+def start(workers):
+    """
+    Fork the worker processes that `render(doc, workers)` uses right away,
+    call it at startup, before the application starts any threads.
+    """
+    if free_threaded():  # pragma: no cover
+        _executor(workers)
+        return
+    pool = _process_pool(workers)
+    if pool is not None:
+        # The workers are forked on the first submit.
+        pool.submit(int).result()
+
+
+@_atexit.register
+def shutdown():
+    """Stop the worker pools started by `start()` and `render()`."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def _plain(node):
+    # Only plain tags are packed structurally, anything else
+    # (Text, Raw, CSS, JS...) knows best how to render itself.
+    return type(node) is Tag or type(node) is VoidTag
+
+
+def pack(node, profile=None):
+    """
+    Return `node` as nested `(name, attrs, close, children)` tuples and strs.
+    """
+    if isinstance(node, str):
+        return node
+    if isinstance(node, Text):
+        return node.text
+    if _plain(node):
+        return (
+            node.name,
+            node.attrs,
+            node.close,
+            tuple(pack(c, profile) for c in node.elements if c),
+        )
+    return "".join(_text(_iter_chunks(node, profile)))
+
+
+def _write(packed, write, profile):
+    if isinstance(packed, str):
+        write(packed)
+        return
+    name, attrs, close, children = packed
+    begin, end = _tag_parts(name, attrs, close, profile)
+    write(begin)
+    if end is None:
+        return
+    for child in children:
+        _write(child, write, profile)
+    write(end)
+
+
+def render_packed(items, profile=None):
+    """Serialize a sequence of packed subtrees, this runs in the workers."""
+    out = []
+    for item in items:
+        _write(item, out.append, profile)
+    return "".join(out)
+
+
+def _split(doc, pieces, profile):
+    # Expand the tree level by level until there are enough subtrees,
+    # the tags that get expanded are emitted as literal open/close strs.
+    items = [e for e in doc.elements if e]
+    while sum(1 for i in items if not isinstance(i, str)) < pieces:
+        expanded, grew = [], False
+        for item in items:
+            if _plain(item) and item.elements:
+                begin, end = _tag_parts(item.name, item.attrs, item.close, profile)
+                if end is None:
+                    expanded.append(begin)
+                    continue
+                expanded.append(begin)
+                expanded.extend(c for c in item.elements if c)
+                expanded.append(end)
+                grew = True
+            else:
+                expanded.append(item)
+        items = expanded
+        if not grew:
+            break
+    return items
+
+
+def _count(doc, limit):
+    # Number of nodes in `doc`, counting stops at `limit`.
+    count, stack = 0, [doc.elements]
+    while stack and count < limit:
+        for node in stack.pop():
+            count += 1
+            if _plain(node) and node.elements:
+                stack.append(node.elements)
+    return count
+
+
+def _render_items(items, profile):
+    return "".join(_text(c for i in items for c in _iter_chunks(i, profile)))
+
+
+def render(doc, workers, executor=None, min_nodes=None):
+    """
+    Serialize `doc` with `workers` parallel workers, returns a str.
+
+    Without an `executor` a pool of `workers` processes is forked on first
+    use and kept, see `start()`. An `executor` may be passed to use another
+    pool, subtrees are handed to a thread pool as they are, and packed for
+    a process pool.
+    Documents with fewer than `min_nodes` nodes (`MIN_NODES` by default)
+    are rendered serially.
+    """
+    if min_nodes is None:
+        min_nodes = MIN_NODES
+    if _count(doc, min_nodes) < min_nodes:
+        return str(doc)
+    profile = doc.profile
+    items = _split(doc, workers * PIECES_PER_WORKER, profile)
+    size = max(1, -(-len(items) // (workers * PIECES_PER_WORKER)))
+    ranges = [(n, n + size) for n in range(0, len(items), size)]
+    if executor is None:
+        if free_threaded():  # pragma: no cover
+            executor = _executor(workers)
+        else:
+            executor = _process_pool(workers)
+        if executor is None:  # pragma: no cover
+            return str(doc)
+    if isinstance(executor, _ProcessPoolExecutor):
+        batches = [tuple(pack(i, profile) for i in items[a:b]) for a, b in ranges]
+        parts = executor.map(render_packed, batches, _repeat(profile))
+    else:
+        batches = [items[a:b] for a, b in ranges]
+        parts = executor.map(_render_items, batches, _repeat(profile))
+    return doc._header() + "".join(parts) + doc._footer()
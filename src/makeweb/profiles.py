@@ -0,0 +1,221 @@
+"""
+Rendering profiles: immutable, per-Doc replacements for the `defaults` flags.
+
+A profile decides how attribute names are translated, which tags are void,
+how void tags are closed, how boolean attributes are written and what goes
+into the document header. Everything is worked out when the profile is
+created, so per-tag work is a dict lookup, and documents rendered
+concurrently with different profiles do not interfere with each other.
+
+    doc = Doc("html", profile=XHTML)
+"""
+
+from .defaults import defaults
+from .utilities import fix_attribute
+
+# Attribute names translated ahead of time by every profile,
+# anything else is translated once on first use.
+common_attributes = (
+    "_async",
+    "_class",
+    "_for",
+    "_type",
+    "accept",
+    "accept_charset",
+    "action",
+    "alt",
+    "aria_describedby",
+    "aria_expanded",
+    "aria_hidden",
+    "aria_label",
+    "aria_labelledby",
+    "autocomplete",
+    "autofocus",
+    "charset",
+    "checked",
+    "className",
+    "cls",
+    "cols",
+    "colspan",
+    "content",
+    "crossorigin",
+    "data_id",
+    "datetime",
+    "defer",
+    "disabled",
+    "download",
+    "enctype",
+    "height",
+    "hidden",
+    "href",
+    "http_equiv",
+    "id",
+    "integrity",
+    "lang",
+    "loading",
+    "max",
+    "maxlength",
+    "media",
+    "method",
+    "min",
+    "minlength",
+    "multiple",
+    "name",
+    "novalidate",
+    "onchange",
+    "onclick",
+    "oninput",
+    "onkeydown",
+    "onload",
+    "onsubmit",
+    "pattern",
+    "placeholder",
+    "readonly",
+    "rel",
+    "required",
+    "role",
+    "rows",
+    "rowspan",
+    "selected",
+    "sizes",
+    "src",
+    "srcset",
+    "step",
+    "style",
+    "tabindex",
+    "target",
+    "title",
+    "type",
+    "value",
+    "width",
+    "wrap",
+)
+
+
+class Profile(object):
+    """
+    Immutable set of rendering rules, pass it as `Doc(profile=...)`.
+
+    `self_closing` ends void tags (">" or " />"),
+    `expand_booleans` writes boolean attributes as `checked="checked"`,
+    `doctype` (the whole declaration) and `html_attrs` make up
+    the header of full documents.
+    The remaining keyword arguments mirror the `defaults` flags.
+    """
+
+    __slots__ = (
+        "name",
+        "doctype",
+        "html_attrs",
+        "void_tags",
+        "self_closing",
+        "expand_booleans",
+        "remove_first_underscore",
+        "replace_single_underscore",
+        "replace_double_underscore",
+        "replace_className",
+        "replace_cls",
+        "preserve_vendor_prefixes",
+        "_options",
+        "_attributes",
+    )
+
+    def __init__(
+        self,
+        name,
+        doctype="<!doctype html>",
+        html_attrs="",
+        void_tags=frozenset(defaults.void_tags),
+        self_closing=">",
+        expand_booleans=False,
+        remove_first_underscore=True,
+        replace_single_underscore=True,
+        replace_double_underscore=False,
+        replace_className=True,
+        replace_cls=True,
+        preserve_vendor_prefixes=True,
+    ):
+        options = dict(
+            doctype=doctype,
+            html_attrs=html_attrs,
+            void_tags=frozenset(void_tags),
+            self_closing=self_closing,
+            expand_booleans=expand_booleans,
+            remove_first_underscore=remove_first_underscore,
+            replace_single_underscore=replace_single_underscore,
+            replace_double_underscore=replace_double_underscore,
+            replace_className=replace_className,
+            replace_cls=replace_cls,
+            preserve_vendor_prefixes=preserve_vendor_prefixes,
+        )
+        set_ = object.__setattr__
+        set_(self, "name", name)
+        for key, value in options.items():
+            set_(self, key, value)
+        set_(self, "_options", options)
+        set_(
+            self, "_attributes", {a: fix_attribute(a, self) for a in common_attributes}
+        )
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Profile {!r} is immutable.".format(self.name))
+
+    def __reduce__(self):
+        return (_make_profile, (self.name, self._options))
+
+    def __repr__(self):
+        return "Profile({!r})".format(self.name)
+
+    def attribute(self, name):
+        """Translate a keyword argument name into an attribute name."""
+        try:
+            return self._attributes[name]
+        except KeyError:
+            # Racing threads compute the same value, so no lock is needed.
+            translated = self._attributes[name] = fix_attribute(name, self)
+            return translated
+
+    def format_attrs(self, attrs):
+        out = []
+        booleans = []
+        for k, v in attrs.items():
+            if v is True:
+                booleans.append(
+                    ' {0}="{0}"'.format(k) if self.expand_booleans else " " + k
+                )
+            elif v is not False:
+                out.append(' {}="{}"'.format(k, v))
+        return "".join(out) + "".join(booleans)
+
+    def header(self, lang):
+        return '{}<html{} lang="{}">'.format(self.doctype, self.html_attrs, lang)
+
+
+def _make_profile(name, options):
+    return Profile(name, **options)
+
+
+HTML5 = Profile("html5")
+
+XHTML = Profile(
+    "xhtml",
+    doctype='<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" '
+    '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">',
+    html_attrs=' xmlns="http://www.w3.org/1999/xhtml"',
+    self_closing=" />",
+    expand_booleans=True,
+)
+
+AMP = Profile("amp", html_attrs=" ⚡")
+
+# Mail clients are happiest with transitional XHTML.
+EMAIL = Profile(
+    "email",
+    doctype='<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" '
+    '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">',
+    html_attrs=' xmlns="http://www.w3.org/1999/xhtml"',
+    self_closing=" />",
+    expand_booleans=True,
+)
+
+profiles = {p.name: p for p in (HTML5, XHTML, AMP, EMAIL)}
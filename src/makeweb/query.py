@@ -0,0 +1,161 @@
+"""
+Indexed element lookup for built documents.
+
+Supports a small CSS selector subset: `tag`, `*`, `#id`, `.class`,
+`[attr]` and `[attr=value]` compounds, joined with descendant (space)
+or child (`>`) combinators, and grouped with commas.
+"""
+
+import re as _re
+from functools import lru_cache as _lru_cache
+
+from .html import Doc, Raw, Tag, Text
+
+_COMBINATORS = _re.compile(r"\s*(>)\s*|\s+")
+_COMPOUND = _re.compile(
+    r"(?P<tag>\*|[A-Za-z][\w-]*)?(?P<rest>(?:#[\w-]+|\.[\w-]+|\[[^\]]+\])*)$"
+)
+_PARTS = _re.compile(r"#([\w-]+)|\.([\w-]+)|\[\s*([\w-]+)\s*(?:=\s*(.*?)\s*)?\]")
+_RAW_TAGS = _re.compile(r"<([A-Za-z][\w-]*)")
+_RAW_IDS = _re.compile(r"""\bid\s*=\s*["']?([^"'\s>]+)""")
+_RAW_CLASSES = _re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+
+
+def _classes(node):
+    value = node.attrs.get("class")
+    if not value or isinstance(value, bool):
+        return ()
+    return str(value).split()
+
+
+class Index(object):
+    """Maps ids, classes and tag names to the tags of a document."""
+
+    def __init__(self, doc):
+        self.ids = {}
+        self.classes = {}
+        self.tags = {}
+        self.parents = {}
+        self.order = {}
+        self.raw = []
+        self._names = None
+        self._walk(doc.elements, None)
+
+    def _walk(self, elements, parent):
+        for node in elements:
+            if isinstance(node, Doc):
+                self._walk(node.elements, parent)
+            elif isinstance(node, Tag) and not isinstance(node, Text):
+                key = id(node)
+                self.order[key] = len(self.order)
+                self.parents[key] = parent
+                self.tags.setdefault(node.name, []).append(node)
+                node_id = node.attrs.get("id")
+                if node_id is not None:
+                    self.ids.setdefault(str(node_id), node)
+                for cls in _classes(node):
+                    self.classes.setdefault(cls, []).append(node)
+                self._walk(node.elements, node)
+            elif isinstance(node, Raw) and node.content is not None:
+                self.raw.append(node)
+
+    def names(self):
+        """
+        Return frozensets of the tag names, ids and classes in the document,
+        including those found in the markup of Raw nodes.
+        """
+        if self._names is None:
+            tags, ids, classes = set(self.tags), set(self.ids), set(self.classes)
+            for node in self.raw:
+                content = node.content
+                if not isinstance(content, str):
+                    content = str(content, "utf-8", "replace")
+                tags.update(t.lower() for t in _RAW_TAGS.findall(content))
+                ids.update(_RAW_IDS.findall(content))
+                for groups in _RAW_CLASSES.findall(content):
+                    classes.update("".join(groups).split())
+            self._names = (frozenset(tags), frozenset(ids), frozenset(classes))
+        return self._names
+
+    def select(self, selector):
+        found = {}
+        for group in parse(selector):
+            for node in self._candidates(group[-1][0]):
+                if self._matches(node, group, len(group) - 1):
+                    found[id(node)] = node
+        return sorted(found.values(), key=lambda n: self.order[id(n)])
+
+    def _candidates(self, simple):
+        tag, node_id, classes, _ = simple
+        if node_id is not None:
+            node = self.ids.get(node_id)
+            return [node] if node is not None else []
+        if classes:
+            return self.classes.get(classes[0], [])
+        if tag is not None:
+            return self.tags.get(tag, [])
+        return [n for nodes in self.tags.values() for n in nodes]
+
+    def _matches(self, node, group, position):
+        simple, combinator = group[position]
+        if not _match_simple(node, simple):
+            return False
+        if position == 0:
+            return True
+        parent = self.parents[id(node)]
+        if combinator == ">":
+            return parent is not None and self._matches(parent, group, position - 1)
+        while parent is not None:
+            if self._matches(parent, group, position - 1):
+                return True
+            parent = self.parents[id(parent)]
+        return False
+
+
+def _match_simple(node, simple):
+    tag, node_id, classes, attrs = simple
+    if tag is not None and node.name != tag:
+        return False
+    if node_id is not None and str(node.attrs.get("id")) != node_id:
+        return False
+    if classes and not set(classes).issubset(_classes(node)):
+        return False
+    for name, value in attrs:
+        if name not in node.attrs:
+            return False
+        if value is not None and str(node.attrs[name]) != value:
+            return False
+    return True
+
+
+def _parse_compound(text, selector):
+    match = _COMPOUND.match(text)
+    if not text or match is None:
+        raise ValueError("Unsupported selector: {!r}".format(selector))
+    tag = match.group("tag")
+    node_id, classes, attrs = None, [], []
+    for id_, cls, attr, value in _PARTS.findall(match.group("rest")):
+        if id_:
+            node_id = id_
+        elif cls:
+            classes.append(cls)
+        else:
+            attrs.append((attr, value.strip("'\"") if value else None))
+    return (None if tag in (None, "*") else tag, node_id, classes, attrs)
+
+
+@_lru_cache(maxsize=256)
+def parse(selector):
+    """
+    Parse `selector` into groups of `(compound, combinator)` pairs,
+    where combinator joins a compound to the one before it.
+    """
+    groups = []
+    for part in selector.split(","):
+        tokens = _COMBINATORS.split(part.strip())
+        group = [(_parse_compound(tokens[0], selector), None)]
+        for n in range(1, len(tokens), 2):
+            combinator = tokens[n] or " "
+            group.append((_parse_compound(tokens[n + 1], selector), combinator))
+        groups.append(group)
+    return groups
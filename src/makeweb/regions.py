@@ -0,0 +1,217 @@
+"""
+Named regions of a page that can be rendered on their own,
+for example to refresh a part of the page over the wire.
+
+Mark a region with `region(name)`, as a context manager
+or as a decorator on a render helper:
+
+    @region("nav")
+    def render_nav(doc, query):
+        ...
+
+    def render_page(query, results):
+        doc = Doc("html")
+        with body():
+            render_nav(doc, query)
+            with region("search-results"):
+                render_results(results)
+        return doc
+
+    regions.render("search-results", render_page, query, results)
+
+runs `render_page` only until the region is complete and returns its html.
+Decorated helpers are not called at all once their regions have been seen
+not to contain the requested one, so prefer decorators for expensive parts.
+Regions are transparent, they add no markup of their own.
+
+What each region contains is learned in a `Registry`, by default the shared
+`default_registry`. Give unrelated pages that reuse region names their own:
+
+    pages = Registry()
+
+    @region("nav", pages)
+    def render_nav(doc, query):
+        ...
+
+A page that is already built can be asked for a region too:
+`doc.render(region="search-results")`.
+"""
+
+import contextvars as _contextvars
+from functools import wraps as _wraps
+
+from .html import Doc, Tag, _text
+from .utilities import get_local_variable_from_caller
+
+
+class Registry(object):
+    """What the regions of a set of pages contain, learned by every render."""
+
+    def __init__(self):
+        # Names of the regions seen inside each region.
+        self.contains = {}
+        # Regions that have been rendered to the end at least once.
+        self.observed = set()
+        # Regions whose decorated helpers return a Doc.
+        self.returns_doc = set()
+
+    def clear(self):
+        """Forget everything learned so far."""
+        self.contains.clear()
+        self.observed.clear()
+        self.returns_doc.clear()
+
+
+default_registry = Registry()
+
+_active = _contextvars.ContextVar("makeweb_regions_active", default=())
+_target = _contextvars.ContextVar("makeweb_regions_target", default=None)
+
+
+class _Target(object):
+    __slots__ = ("name", "may_skip", "skipped")
+
+    def __init__(self, name, may_skip):
+        self.name, self.may_skip, self.skipped = name, may_skip, False
+
+
+class _Found(BaseException):
+    # Not an Exception, so `except Exception:` in render code does not catch it.
+    def __init__(self, html):
+        self.html = html
+
+
+class Region(Doc):
+    """Transparent node holding the contents of a region."""
+
+    def __init__(self, name):
+        super(Region, self).__init__()
+        self.name = name
+
+
+def _enter(name, registry):
+    active = _active.get()
+    for outer, outer_registry in active:
+        outer_registry.contains.setdefault(outer, set()).add(name)
+    return _active.set(active + ((name, registry),))
+
+
+def _done(name, registry, node, profile):
+    registry.observed.add(name)
+    target = _target.get()
+    if target is not None and target.name == name:
+        raise _Found("".join(_text(node._chunks(profile))))
+
+
+def _skip(name, registry):
+    target = _target.get()
+    if target is None or not target.may_skip or target.name == name:
+        return False
+    if name in registry.observed and target.name not in registry.contains.get(name, ()):
+        target.skipped = True
+        return True
+    return False
+
+
+class region(object):
+    """
+    Mark the region `name`, as `with region(name):` or as a decorator.
+    What it contains is learned in `registry`, `default_registry` by default.
+    """
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = default_registry if registry is None else registry
+        self._stack = []
+
+    def __enter__(self):
+        doc = get_local_variable_from_caller("doc", Doc)
+        node = Region(self.name)
+        doc.elements.append(node)
+        doc._version += 1
+        backup, doc.elements = doc.elements, node.elements
+        self._stack.append((doc, node, backup, _enter(self.name, self.registry)))
+        return node
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        doc, node, backup, token = self._stack.pop()
+        doc.elements = backup
+        _active.reset(token)
+        if exc_type is None:
+            _done(self.name, self.registry, node, doc.profile)
+
+    def __call__(self, func):
+        name, registry = self.name, self.registry
+
+        @_wraps(func)
+        def wrapper(*args, **kwargs):
+            if _skip(name, registry):
+                return Doc() if name in registry.returns_doc else None
+            enclosing = next(
+                (a for a in list(args) + list(kwargs.values()) if isinstance(a, Doc)),
+                None,
+            )
+            if enclosing is None:
+                try:
+                    enclosing = get_local_variable_from_caller("doc", Doc)
+                except LookupError:
+                    pass
+            node = Region(name)
+            if enclosing is not None:
+                enclosing.elements.append(node)
+                enclosing._version += 1
+                backup, enclosing.elements = enclosing.elements, node.elements
+            token = _enter(name, registry)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                _active.reset(token)
+                if enclosing is not None:
+                    enclosing.elements = backup
+            profile = enclosing.profile if enclosing is not None else None
+            if isinstance(result, Doc):
+                registry.returns_doc.add(name)
+                if not node.elements:
+                    # A fragment was returned, the region wraps its contents.
+                    if enclosing is not None:
+                        enclosing.elements.remove(node)
+                    node.elements, result.elements = result.elements, [node]
+                    profile = result.profile
+            _done(name, registry, node, profile)
+            return result
+
+        return wrapper
+
+
+def render(name, func, *args, **kwargs):
+    """
+    Return the html of region `name` of the page built by
+    `func(*args, **kwargs)`, skipping as much of `func` as possible.
+
+    Raises LookupError when `func` does not build the region.
+    """
+    for may_skip in (True, False):
+        target = _Target(name, may_skip)
+        token = _target.set(target)
+        try:
+            func(*args, **kwargs)
+        except _Found as found:
+            return found.html
+        finally:
+            _target.reset(token)
+        if not target.skipped:
+            break
+        # A skipped region held the requested one this time, try again in full.
+    raise LookupError("Region {!r} was not rendered.".format(name))
+
+
+def find(node, name):
+    """Return the first Region called `name` below `node`, or None."""
+    for child in getattr(node, "elements", ()):
+        if isinstance(child, Region) and child.name == name:
+            return child
+        if isinstance(child, (Doc, Tag)):
+            found = find(child, name)
+            if found is not None:
+                return found
+    return None
@@ -0,0 +1,236 @@
+"""
+Helpers to send MakeWeb documents from Flask and Quart.
+
+Both frameworks are optional, they are imported only when a helper is called.
+"""
+
+import mimetypes as _mimetypes
+import os as _os
+import re as _re
+
+from .compression import codecs, compress, compress_cached, negotiate, suffixes
+from .utilities import new_hash
+
+# For content-hashed files, which never change under the same name.
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Other static files may change, clients revalidate them with the ETag.
+REVALIDATE = "no-cache"
+
+# Names such as `style.0123456789abcdef.css` written by `CSS.publish()`.
+_HASHED_NAME = _re.compile(r"\.[0-9a-f]{8,}\.[^.]+$")
+
+
+def etag_for(version):
+    """Return a strong ETag for a cheap version key, such as a content hash."""
+    if not isinstance(version, bytes):
+        version = str(version).encode("utf-8")
+    digest = new_hash()
+    digest.update(version)
+    return '"{}"'.format(digest.hexdigest())
+
+
+def _codec_tag(tag, codec):
+    # Each encoding is a different representation, with its own ETag.
+    if codec is None:
+        return tag
+    return '{}-{}"'.format(tag[:-1], codec)
+
+
+def not_modified(etag, if_none_match):
+    """Return True if the `If-None-Match` header value matches `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _plain_bytes(chunks):
+    # WSGI servers accept only bytes, the zero-copy memoryviews of Include
+    # and mapped Raw nodes are kept for render_to().
+    for chunk in chunks:
+        yield chunk if type(chunk) is bytes else bytes(chunk)
+
+
+def encode_body(content, accept_encoding, cache=False):
+    """
+    Return `(body, headers)` for `content` (a Doc, str or bytes)
+    compressed with the best codec allowed by `accept_encoding`.
+
+    With `cache=True` a str body is compressed once and reused,
+    which suits content that never changes, such as CSS/JS bundles.
+    """
+    codec = negotiate(accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if codec is not None:
+        headers["Content-Encoding"] = codec
+    if isinstance(content, (str, bytes)):
+        if codec is None:
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            return content, headers
+        if cache:
+            return compress_cached(content, codec), headers
+        return compress(content, codec), headers
+    if codec is None:
+        return _plain_bytes(content.iter_bytes()), headers
+    return _plain_bytes(content.render_compressed(codec)), headers
+
+
+def _response(response_cls, request, content, status, headers, mimetype, **options):
+    cache, etag, version = options["cache"], options["etag"], options["version"]
+    if_none_match = request.headers.get("If-None-Match", "")
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    codec = negotiate(accept_encoding)
+    tag = None
+    if version is not None:
+        # Fast path: answer from the version key without rendering at all.
+        tag = _codec_tag(etag_for(version), codec)
+        if not_modified(tag, if_none_match):
+            return _not_modified(response_cls, tag, headers)
+    if callable(content):
+        content = content()
+    if tag is None and etag:
+        if isinstance(content, (str, bytes)):
+            tag = etag_for(content)
+        else:
+            # Buffer the render, the hash must be known before headers are sent.
+            body = b"".join(content.iter_bytes())
+            tag, content = content.etag, body
+        tag = _codec_tag(tag, codec)
+        if not_modified(tag, if_none_match):
+            return _not_modified(response_cls, tag, headers)
+    body, extra = encode_body(content, accept_encoding, cache=cache)
+    if tag is not None:
+        extra["ETag"] = tag
+    extra.update(headers or {})
+    return response_cls(body, status=status, headers=extra, mimetype=mimetype)
+
+
+def _not_modified(response_cls, tag, headers):
+    # A 304 carries the headers a 200 would, other than the body's.
+    extra = {"ETag": tag, "Vary": "Accept-Encoding"}
+    extra.update(headers or {})
+    return response_cls(b"", status=304, headers=extra)
+
+
+def flask_response(
+    content,
+    status=200,
+    headers=None,
+    mimetype="text/html",
+    cache=False,
+    etag=False,
+    version=None,
+):
+    """
+    Return a Flask response for `content`, compressed if the client allows.
+
+    `content` may be a Doc, a str, or a callable returning either;
+    a callable is only invoked when a response body is needed.
+    With `etag=True` the rendered output is hashed and `If-None-Match`
+    is answered with 304. Passing a `version` key skips rendering entirely
+    when the client already has that version.
+    """
+    try:
+        from flask import Response, request
+    except ImportError:  # pragma: no cover
+        raise ImportError("Please `pip install flask` to use flask_response().")
+    return _response(
+        Response,
+        request,
+        content,
+        status,
+        headers,
+        mimetype,
+        cache=cache,
+        etag=etag,
+        version=version,
+    )
+
+
+def quart_response(
+    content,
+    status=200,
+    headers=None,
+    mimetype="text/html",
+    cache=False,
+    etag=False,
+    version=None,
+):
+    """Quart counterpart of `flask_response()`."""
+    try:
+        from quart import Response, request
+    except ImportError:  # pragma: no cover
+        raise ImportError("Please `pip install quart` to use quart_response().")
+    return _response(
+        Response,
+        request,
+        content,
+        status,
+        headers,
+        mimetype,
+        cache=cache,
+        etag=etag,
+        version=version,
+    )
+
+
+def _static(response_cls, request, static_dir, filename):
+    root = _os.path.abspath(static_dir)
+    path = _os.path.abspath(_os.path.join(root, filename))
+    if _os.path.dirname(path) != root or not _os.path.isfile(path):
+        return response_cls(b"", status=404)
+    offered = tuple(c for c in codecs if _os.path.isfile(path + suffixes[c]))
+    codec = negotiate(request.headers.get("Accept-Encoding", ""), offered)
+    if codec is not None:
+        path += suffixes[codec]
+    with open(path, "rb") as f:
+        stat = _os.fstat(f.fileno())
+        tag = _codec_tag(
+            etag_for("{}:{}:{}".format(filename, stat.st_mtime_ns, stat.st_size)),
+            codec,
+        )
+        headers = {
+            "Cache-Control": IMMUTABLE if _HASHED_NAME.search(filename) else REVALIDATE,
+            "ETag": tag,
+            "Vary": "Accept-Encoding",
+        }
+        if not_modified(tag, request.headers.get("If-None-Match", "")):
+            return response_cls(b"", status=304, headers=headers)
+        body = f.read()
+    if codec is not None:
+        headers["Content-Encoding"] = codec
+    mimetype = _mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return response_cls(body, status=200, headers=headers, mimetype=mimetype)
+
+
+def flask_static(static_dir, filename):
+    """
+    Return a Flask response for a file in `static_dir`, using a precompressed
+    sibling when the client accepts its encoding.
+
+    Content-hashed names, such as those written by `CSS.publish()`,
+    are marked immutable, so browsers fetch each file once. Other files
+    are revalidated with an ETag based on their mtime and size.
+    """
+    try:
+        from flask import Response, request
+    except ImportError:  # pragma: no cover
+        raise ImportError("Please `pip install flask` to use flask_static().")
+    return _static(Response, request, static_dir, filename)
+
+
+def quart_static(static_dir, filename):
+    """Quart counterpart of `flask_static()`."""
+    try:
+        from quart import Response, request
+    except ImportError:  # pragma: no cover
+        raise ImportError("Please `pip install quart` to use quart_static().")
+    return _static(Response, request, static_dir, filename)
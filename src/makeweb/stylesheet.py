@@ -1,32 +1,785 @@
-from .html import Doc
-from .utilities import fix_attribute, get_local_variable_from_caller
+import marshal as _marshal
+import os as _os
+import re as _re
+import sys as _sys
+from collections import OrderedDict as _OrderedDict
+
+from . import compression as _compression
+from . import optimizer as _optimizer
+from .bundle import _package
+from .defaults import defaults
+from .html import Doc, VoidTag, _Encoded
+from .utilities import (
+    fix_attribute,
+    get_local_variable_from_caller,
+    new_hash,
+    write_atomic,
+)
+
+# Standard CSS properties are translated up front, so building a stylesheet
+# costs one dict lookup per declaration instead of a `fix_attribute()` call.
+_VENDORS = ("webkit", "moz", "ms", "o")
+# `defaults` flags that change how property names are translated.
+_FLAGS = (
+    "remove_first_underscore",
+    "replace_single_underscore",
+    "replace_double_underscore",
+    "preserve_vendor_prefixes",
+)
+_DEFAULT_FLAGS = (True, True, False, True)
+
+
+def _property_table():
+    table = {}
+    for name in _optimizer._PROPERTIES:
+        table[name] = name
+        table[name.replace("-", "_")] = name
+        for vendor in _VENDORS:
+            table["_{}_{}".format(vendor, name.replace("-", "_"))] = "-{}-{}".format(
+                vendor, name
+            )
+    return table
+
+
+_tables = {_DEFAULT_FLAGS: _property_table()}
+
+
+def _property_names(flags=None):
+    """Python names to CSS property names for the `defaults` flags in use."""
+    if flags is None:
+        flags = tuple(getattr(defaults, f) for f in _FLAGS)
+    names = _tables.get(flags)
+    if names is None:
+        names = _tables[flags] = {}
+    return names
+
+
+def _css_name(names, name):
+    # Unknown names are translated once and memoized next to the table.
+    css = names.get(name)
+    if css is None:
+        vendor = name[1:].partition("_")[0] if name.startswith("_") else None
+        if vendor in _VENDORS and defaults.preserve_vendor_prefixes:
+            css = "-{}-{}".format(vendor, fix_attribute(name[len(vendor) + 2 :]))
+        else:
+            css = fix_attribute(name)
+        names[name] = css
+    return css
+
+
+def _declarations(attrs, theme, names):
+    return {
+        (names.get(k) or _css_name(names, k)): _resolve(v, theme)
+        for k, v in attrs.items()
+    }
+
+
+def _format_value(prop, value):
+    # A tuple holds fallbacks, such as ("-webkit-box", "flex").
+    if isinstance(value, tuple):
+        return ";".join("{}:{}".format(prop, v) for v in value)
+    return "{}:{}".format(prop, value)
+
+
+class Rule(object):
+    """A selector and its ordered property map."""
+
+    __slots__ = ("selector", "props", "_text")
+
+    def __init__(self, selector, props):
+        self.selector = selector
+        self.props = props
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            body = ";".join(_format_value(k, v) for k, v in self.props.items())
+            self._text = "{}{{{}}}".format(self.selector, body)
+        return self._text
+
+    def update(self, props):
+        for k, v in props.items():
+            if v is None:
+                self.props.pop(k, None)
+            else:
+                self.props[k] = v
+        self._text = None
+
+    def copy(self):
+        return Rule(self.selector, dict(self.props))
+
+    def reset(self):
+        self._text = None
+
+
+class AtRule(object):
+    """An at-rule such as `@media` holding nested rules, indexed by selector."""
+
+    __slots__ = ("prelude", "rules", "index", "_text")
+
+    def __init__(self, prelude, rules=()):
+        self.prelude = prelude
+        self.rules = list(rules)
+        self.index = {r.selector: r for r in self.rules if r.selector is not None}
+        self._text = None
+
+    @property
+    def selector(self):
+        return self.prelude
+
+    def __str__(self):
+        if self._text is None:
+            body = ";".join(str(r) for r in self.rules)
+            self._text = "{}{{{}}}".format(self.prelude, body)
+        return self._text
+
+    def update(self, blocks):
+        for selector, props in blocks.items():
+            rule = self.index.get(selector)
+            if rule is None:
+                rule = self.index[selector] = Rule(selector, {})
+                self.rules.append(rule)
+            rule.update(props)
+        self._text = None
+
+    def copy(self):
+        return AtRule(self.prelude, [r.copy() for r in self.rules])
+
+    def reset(self):
+        for rule in self.rules:
+            rule.reset()
+        self.index = {r.selector: r for r in self.rules if r.selector is not None}
+        self._text = None
+
+
+class RawRule(object):
+    """Stylesheet text kept verbatim, such as a parsed `@keyframes` block."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    @property
+    def selector(self):
+        return None
+
+    def __str__(self):
+        return self.text
+
+    def copy(self):
+        return self
+
+    def reset(self):
+        pass
+
+
+def _props(decls):
+    props = {}
+    for k, v in decls:
+        if k in props:
+            old = props[k]
+            props[k] = (old if isinstance(old, tuple) else (old,)) + (v,)
+        else:
+            props[k] = v
+    return props
+
+
+def _from_items(items):
+    rules = []
+    for item in items:
+        if item[0] == "rule":
+            rules.append(Rule(item[1], _props(item[2])))
+        elif item[0] == "media":
+            rules.append(AtRule(item[1], _from_items(item[2])))
+        else:
+            rules.append(RawRule(item[1]))
+    return rules
+
+
+def _to_items(rules):
+    items = []
+    for rule in rules:
+        if isinstance(rule, Rule):
+            decls = []
+            for k, v in rule.props.items():
+                for value in v if isinstance(v, tuple) else (v,):
+                    decls.append((k, str(value)))
+            items.append(["rule", rule.selector, decls])
+        elif isinstance(rule, AtRule):
+            items.append(["media", rule.prelude, _to_items(rule.rules)])
+        else:
+            items.append(["raw", rule.text, False])
+    return items
+
+
+_VARIABLE = _re.compile(r"\$([A-Za-z_][\w-]*)")
+
+
+def _resolve(value, theme):
+    # Substitute `$name` theme variables, tuples hold fallback values.
+    if isinstance(value, tuple):
+        return tuple(_resolve(v, theme) for v in value)
+    if not isinstance(value, str) or "$" not in value:
+        return value
+
+    def lookup(match):
+        try:
+            return str(theme[match.group(1)])
+        except KeyError:
+            raise KeyError("Unknown theme variable: ${}".format(match.group(1)))
+
+    return _VARIABLE.sub(lookup, value)
+
+
+def _nest(parent, child):
+    # `&` stands for the parent selector, any other child is a descendant.
+    if "," not in parent and "," not in child:
+        return child.replace("&", parent) if "&" in child else parent + " " + child
+    return ",".join(
+        _nest(p.strip(), c.strip())
+        for p in _optimizer._split(parent, ",")
+        for c in _optimizer._split(child, ",")
+    )
+
+
+def _media_type(query):
+    # Split "screen and (x)" into ("screen", "(x)"), the type is optional.
+    if query.startswith("("):
+        return None, query
+    kind, _, conditions = query.partition(" and ")
+    return kind.strip(), conditions.strip()
+
+
+def _join_media(outer, inner):
+    """Combine nested `@media` preludes, keeping the media type first."""
+    parts = []
+    for query in (outer[6:].strip(), inner[6:].strip()):
+        if len(_optimizer._split(query, ",")) > 1 or query.startswith("not "):
+            raise ValueError("Can not nest media query {!r}.".format(query))
+        parts.append(_media_type(query))
+    (outer_kind, outer_conditions), (kind, conditions) = parts
+    if outer_kind and kind and outer_kind != kind:
+        raise ValueError(
+            "Can not nest media type {!r} in {!r}.".format(kind, outer_kind)
+        )
+    parts = [outer_kind or kind, outer_conditions, conditions]
+    return "@media " + " and ".join(p for p in parts if p)
+
+
+def _flatten(selector, attrs, theme, names, top, target, query=None):
+    """
+    Append the rules for `selector` and its nested dicts to `target`,
+    nested `@media` blocks go to `top`, combined with the enclosing `query`.
+    """
+    props, nested = {}, []
+    for k, v in attrs.items():
+        if isinstance(v, dict):
+            nested.append((k, v))
+        else:
+            props[names.get(k) or _css_name(names, k)] = _resolve(v, theme)
+    if props or not nested:
+        target.append(Rule(selector, props))
+    for key, value in nested:
+        if key.startswith("@media"):
+            inner = key if query is None else _join_media(query, key)
+            block = AtRule(inner)
+            top.append(block)
+            _flatten(selector, value, theme, names, top, block.rules, inner)
+            if not block.rules:
+                top.remove(block)
+        elif key.startswith("@"):
+            raise ValueError("Only @media can be nested, got {!r}.".format(key))
+        else:
+            _flatten(_nest(selector, key), value, theme, names, top, target, query)
+
+
+def _compile(source, theme, names):
+    # Rules for a dict of selectors (or at-rules) to nested declarations.
+    rules = []
+    for target, attrs in source.items():
+        if target.startswith("@keyframes"):
+            frames = [
+                Rule(frame, _declarations(props, theme, names))
+                for frame, props in attrs.items()
+                if isinstance(props, dict)
+            ]
+            rules.append(AtRule(target, frames))
+        elif target.startswith("@media"):
+            block = AtRule(target)
+            rules.append(block)
+            for selector, props in attrs.items():
+                if isinstance(props, dict):
+                    _flatten(selector, props, theme, names, rules, block.rules, target)
+        else:
+            _flatten(target, attrs, theme, names, rules, rules)
+    for rule in rules:
+        if isinstance(rule, AtRule):
+            rule.reset()
+    return rules
+
+
+# Compiled `CSS.load()` sources in this process, by input hash.
+_compiled = {}
+
+
+def _compile_cached(source, theme, cache):
+    flags = tuple(getattr(defaults, f) for f in _FLAGS)
+    # Compiled rules from another makeweb version may differ, the shared
+    # cache keys them by the library's own files too.
+    parts = (source, theme, flags, _marshal.version, _package())
+    digest = new_hash()
+    digest.update(repr(parts).encode("utf-8"))
+    key = "makeweb.css:" + digest.hexdigest()
+    data = _compiled.get(key)
+    if data is None and cache is not None:
+        data = cache.get(key)
+    if data is None:
+        rules = _compile(source, theme, _property_names(flags))
+        data = _marshal.dumps(_to_items(rules))
+        if cache is not None:
+            cache.set(key, "", data)
+    _compiled[key] = data
+    return _from_items(_marshal.loads(data))
+
+
+class _Style(list):
+    """
+    The serialized rules of a CSS, one str per rule.
+    Edits are parsed back into the rules of the stylesheet right away.
+    """
+
+    def __init__(self, css):
+        super(_Style, self).__init__()
+        self._css = css
+
+    def append(self, text):
+        self._css.style  # Refresh first, the rules may have changed since.
+        super(_Style, self).append(text)
+        self._css._edited([text])
+
+    def extend(self, texts):
+        texts = list(texts)
+        self._css.style
+        super(_Style, self).extend(texts)
+        self._css._edited(texts)
+
+    def __iadd__(self, texts):
+        self.extend(texts)
+        return self
+
+
+def _reparsing(name):
+    method = getattr(list, name)
+
+    def edit(self, *args):
+        self._css.style
+        result = method(self, *args)
+        self._css._edited()
+        return result
+
+    edit.__name__ = name
+    return edit
+
+
+for _name in ("insert", "remove", "pop", "clear", "sort", "reverse"):
+    setattr(_Style, _name, _reparsing(_name))
+for _name in ("__setitem__", "__delitem__", "__imul__"):
+    setattr(_Style, _name, _reparsing(_name))
+del _name
+
+
+class ClassToken(str):
+    """
+    A class name generated by `CSS.scoped()`, usable anywhere a str is,
+    such as `cls=token` or `cls=[token, other]`.
+    """
+
+    def __new__(cls, value, name):
+        token = super(ClassToken, cls).__new__(cls, value)
+        token.name = name
+        return token
+
+    @property
+    def selector(self):
+        return "." + self
+
+    def __reduce__(self):
+        return ClassToken, (str(self), self.name)
 
 
 class CSS(object):
-    def __init__(self):
-        self.style = []
+    """
+    Stylesheet built from Python calls.
+
+    Rules are kept in `rules` as Rule, AtRule and RawRule objects,
+    and the last rule for each selector is indexed, so `override()`,
+    `copy()` and `merge()` never re-run the calls that built a stylesheet.
+    Each rule caches its own serialized text.
+
+    With `optimize=True` the rules are optimized (see `optimize()`)
+    when the stylesheet is first serialized after a change.
+    With `atomic=True` elements may also be styled by `atoms()`,
+    one short class per distinct declaration.
+
+    Declarations may nest: dict values add rules for related selectors,
+    `&` standing for the enclosing selector, and `@media` keys wrap the
+    enclosing selector in a media query. `$name` in a value is replaced
+    by `theme[name]` when the rule is added.
+
+    Class names made by `scoped()` are salted with `namespace`, so two
+    stylesheets scoping the same name get different classes. It defaults
+    to the module and line that create the stylesheet, which is the same
+    in every process running the same code.
+    """
+
+    # Subsets kept by `for_doc()`, per stylesheet.
+    for_doc_maxsize = 64
+
+    def __init__(self, optimize=False, atomic=False, theme=None, namespace=None):
+        if namespace is None:
+            caller = _sys._getframe(1)
+            namespace = "{}:{}".format(
+                caller.f_globals.get("__name__"), caller.f_lineno
+            )
+        self.namespace = namespace
+        self.rules = []
+        self.theme = dict(theme or {})
+        self._index = {}
+        self.atomic = atomic
+        self._atoms = {}
+        # Generated class names and what they were made for, see `_token()`.
+        self._tokens = {}
+        self._cache = {}
+        self._style = _Style(self)
+        self._style_stale = True
+        self._optimize = optimize
+        self.savings = None
+        # Bumped on every change, so derived results can be invalidated.
+        self._version = 0
+        self._subsets = _OrderedDict()
+
+    def __getstate__(self):
+        # Only the rules and settings, derived forms are rebuilt on demand.
+        state = dict(self.__dict__)
+        for name in ("_index", "_cache", "_style", "_style_stale", "_subsets"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = {}
+        self._style = _Style(self)
+        self._style_stale = True
+        self._subsets = _OrderedDict()
+        self._reindex()
 
     def __str__(self):
-        return "".join(self.style)
+        text = self._cache.get("str")
+        if text is None:
+            if self._optimize:
+                self.optimize()
+            text = self._cache["str"] = "".join(self.style)
+        return text
+
+    @property
+    def style(self):
+        """
+        The serialized rules, one str per rule.
+        Text added to it, such as `css.style.append("a{color:red}")`,
+        is parsed into `rules`.
+        """
+        if self._style_stale:
+            list.__setitem__(self._style, slice(None), [str(r) for r in self.rules])
+            self._style_stale = False
+        return self._style
+
+    @style.setter
+    def style(self, style):
+        self.rules = _from_items(_optimizer.parse("".join(style)))
+        self._reindex()
+        self._changed()
+
+    def _edited(self, added=None):
+        # Called by `style` after an edit, `added` holds appended text.
+        if added is None:
+            self.rules = _from_items(_optimizer.parse("".join(self._style)))
+        else:
+            self.rules.extend(_from_items(_optimizer.parse("".join(added))))
+        self._reindex()
+        self._changed()
+        self._style_stale = False  # It holds the edited text already.
+
+    def _reindex(self):
+        self._index = {r.selector: r for r in self.rules if r.selector is not None}
+
+    def _add(self, rule):
+        self.rules.append(rule)
+        self._index[rule.selector] = rule
+        self._changed()
+
+    def override(self, _target, **attrs):
+        """
+        Change the last rule for `_target` in place, a property set to None
+        is removed. Adds a new rule when there is none for `_target` yet.
+        """
+        rule = self._index.get(_target)
+        if rule is None:
+            return self(_target, **attrs)
+        theme, names = self.theme, _property_names()
+        if isinstance(rule, AtRule):
+            rule.update(
+                {
+                    s: _declarations(p, theme, names)
+                    for s, p in attrs.items()
+                    if isinstance(p, dict)
+                }
+            )
+        else:
+            rule.update(_declarations(attrs, theme, names))
+        self._changed()
+
+    def scoped(self, _name, **attrs):
+        """
+        Return a ClassToken for `_name`, a short class name hashed from it,
+        and set `attrs` on the rule for that single class.
+
+        Dict values add rules for related selectors, `&` standing for
+        the class: `**{"&:hover": {...}, "& > a": {...}}`.
+        Calling again with the same name returns the same token
+        and overrides its rules.
+        """
+        token = self._token("c", 6, _name, self.namespace)
+        selector = token.selector
+        nested = {k: v for k, v in attrs.items() if isinstance(v, dict)}
+        props = {k: v for k, v in attrs.items() if k not in nested}
+        if props:
+            self.override(selector, **props)
+        for key, value in nested.items():
+            if "&" in key:
+                key = key.replace("&", selector)
+            else:
+                key = "{} {}".format(selector, key)
+            self.override(key, **value)
+        return token
+
+    def atoms(self, **attrs):
+        """
+        Return a tuple of ClassTokens, one per declaration in `attrs`,
+        adding a single-declaration rule the first time a pair is seen.
+        See also `style_atoms()`.
+        """
+        if not self.atomic:
+            raise ValueError("Atoms need an atomic stylesheet: CSS(atomic=True).")
+        tokens, names = [], _property_names()
+        for k, v in attrs.items():
+            key = (k, v)
+            token = self._atoms.get(key)
+            if token is None:
+                prop = names.get(k) or _css_name(names, k)
+                declaration = "{}:{}".format(prop, v)
+                token = self._token("a", 8, declaration)
+                self._add(Rule(token.selector, {prop: v}))
+                self._atoms[key] = token
+            tokens.append(token)
+        return tuple(tokens)
+
+    def _token(self, prefix, length, name, salt=""):
+        """
+        Return the class name for `name`, hashed with `salt` and cut to
+        `length` hex digits. Made longer when it is taken by another name.
+        """
+        digest = new_hash()
+        digest.update("{}\0{}".format(salt, name).encode("utf-8"))
+        digest = digest.hexdigest()
+        for end in range(length, len(digest) + 1):
+            token = prefix + digest[:end]
+            taken = self._tokens.setdefault(token, name)
+            if taken == name:
+                return ClassToken(token, name)
+        raise ValueError("No unique class name for {!r}.".format(name))
+
+    def copy(self):
+        """Return an independent copy, for building variants such as themes."""
+        other = CSS(
+            optimize=self._optimize,
+            atomic=self.atomic,
+            theme=self.theme,
+            namespace=self.namespace,
+        )
+        other.rules = [r.copy() for r in self.rules]
+        other._atoms = dict(self._atoms)
+        other._tokens = dict(self._tokens)
+        other._reindex()
+        return other
+
+    def merge(self, other):
+        """
+        Apply the rules of `other` as overrides, rules for new selectors
+        are added at the end. Returns self.
+        """
+        for rule in other.rules:
+            target = self._index.get(rule.selector)
+            if target is None or type(target) is not type(rule):
+                self.rules.append(rule.copy())
+                if rule.selector is not None:
+                    self._index[rule.selector] = self.rules[-1]
+            elif isinstance(rule, AtRule):
+                target.update(
+                    {r.selector: r.props for r in rule.rules if isinstance(r, Rule)}
+                )
+            else:
+                target.update(rule.props)
+        self._changed()
+        return self
+
+    def optimize(self):
+        """
+        Merge, deduplicate and minify the rules in place,
+        returns the Savings, also kept as `savings`.
+        """
+        before = "".join(self.style)
+        self.style = _optimizer.optimize(self.style)
+        self.savings = _optimizer.Savings(
+            len(before.encode("utf-8")), len("".join(self.style).encode("utf-8"))
+        )
+        return self.savings
+
+    def __bytes__(self):
+        data = self._cache.get("bytes")
+        if data is None:
+            # Keeps the str as well, so str(doc) does not decode it again.
+            data = self._cache["bytes"] = _Encoded(str(self))
+        return data
+
+    def invalidate(self):
+        """Drop the cached forms after changing `rules` directly."""
+        for rule in self.rules:
+            rule.reset()
+        self._reindex()
+        self._changed()
+
+    def _changed(self):
+        self._cache = {}
+        self._style_stale = True
+        self._version += 1
+
+    def for_doc(self, doc):
+        """
+        Return a CSS with only the rules whose selectors could match
+        the tag names, ids and classes in `doc`.
+
+        Results are memoized by stylesheet version and the set of names
+        used, so pages of the same shape share one subset.
+        """
+        text = str(self)  # Optimizes first, when that is pending.
+        key = (self._version, bool(doc.doctype)) + doc._lookup().names()
+        subset = self._subsets.get(key)
+        if subset is not None:
+            self._subsets.move_to_end(key)
+            return subset
+        tags, ids, classes = key[2:]
+        if doc.doctype:
+            tags = tags | {"html"}
+        items = self._cache.get("items")
+        if items is None:
+            items = self._cache["items"] = _optimizer.parse(text)
+        subset = CSS(namespace=self.namespace)
+        subset.style = _optimizer.serialize(_optimizer.shake(items, tags, ids, classes))
+        self._subsets[key] = subset
+        while len(self._subsets) > self.for_doc_maxsize:
+            self._subsets.popitem(last=False)
+        return subset
+
+    def compressed(self, codec="gzip", level=None):
+        """Return the stylesheet compressed with `codec`, cached until it changes."""
+        key = (codec, level)
+        data = self._cache.get(key)
+        if data is None:
+            data = self._cache[key] = _compression.compress(bytes(self), codec, level)
+        return data
+
+    def minified(self):
+        """Return the optimized stylesheet as bytes, leaving `style` as is."""
+        data = self._cache.get("minified")
+        if data is None:
+            text = "".join(_optimizer.optimize(self.style))
+            data = self._cache["minified"] = text.encode("utf-8")
+        return data
+
+    def publish(self, static_dir, url="/static/", name="style", codecs=("gzip", "br")):
+        """
+        Write the minified stylesheet to `static_dir` under a content-hashed
+        file name, next to precompressed siblings (`.gz`, `.br`),
+        and return a detached `link` tag for it under `url`.
+
+        Serve the files with `serve.flask_static()` or `serve.quart_static()`,
+        they never change, so browsers may cache them for good.
+        """
+        data = self.minified()
+        digest = new_hash()
+        digest.update(data)
+        filename = "{}.{}.css".format(name, digest.hexdigest()[:16])
+        path = _os.path.join(static_dir, filename)
+        if not _os.path.exists(path):
+            for codec in codecs:
+                if _compression.available(codec):
+                    level = _compression.max_levels[codec]
+                    write_atomic(
+                        path + _compression.suffixes[codec],
+                        _compression.compress(data, codec, level),
+                    )
+            # Written last, so its presence means the siblings exist too.
+            write_atomic(path, data)
+        href = url.rstrip("/") + "/" + filename
+        return VoidTag.detached("link", rel="stylesheet", href=href)
+
+    def _chunks(self, profile=None):
+        # Pre-encoded, so embedding costs nothing per render.
+        yield bytes(self)
 
     def __call__(self, _target, **attrs):
-        # Special handling for @keyframes and @media queries
-        if _target.startswith("@keyframes") or _target.startswith("@media"):
-            rules = []
-            for selector, properties in attrs.items():
-                if isinstance(properties, dict):
-                    formatted_props = [
-                        f"{fix_attribute(k)}:{v}" for k, v in properties.items()
-                    ]
-                    rules.append(f"{selector}{{{';'.join(formatted_props)}}}")
-            style = f"{_target}{{{';'.join(rules)}}}"
-        else:
-            # Regular CSS rules
-            attrs = [f"{fix_attribute(k)}:{v}" for k, v in attrs.items()]
-            style = f"{_target}{{{';'.join(attrs)}}}"
-
-        self.style.append(style)
-
-    def embed(self):
+        for rule in _compile({_target: attrs}, self.theme, _property_names()):
+            self._add(rule)
+
+    def load(self, source, cache=None):
+        """
+        Add the rules in `source`, a dict of selectors to nested declarations
+        as taken by `__call__`, compiled once per distinct source and theme.
+
+        Compiled rules are kept by input hash for the process, and in `cache`
+        (a FragmentCache) when given, so other workers and later startups
+        skip compiling.
+        """
+        for rule in _compile_cached(source, self.theme, cache):
+            self._add(rule)
+
+    def embed(self, critical=False):
+        """
+        Add the stylesheet to the caller's Doc, with `critical=True`
+        only the rules needed by that Doc are rendered, see `for_doc()`.
+        """
         doc = get_local_variable_from_caller("doc", Doc)
-        doc.elements.append(self)
+        doc.elements.append(_Critical(self, doc) if critical else self)
+        doc._version += 1
+
+
+def style_atoms(css, **attrs):
+    """
+    Return the atom class tokens of `css` for `attrs`, to pass as `cls`:
+    `div(cls=style_atoms(css, display="flex", align_items="center"))`.
+    """
+    return css.atoms(**attrs)
+
+
+class _Critical(object):
+    # Renders the rules of `css` that `doc` needs, worked out at render time.
+    def __init__(self, css, doc):
+        self.css = css
+        self.doc = doc
+
+    def __str__(self):
+        return str(self.css.for_doc(self.doc))
+
+    def _chunks(self, profile=None):
+        yield bytes(self.css.for_doc(self.doc))
@@ -1,23 +1,37 @@
+import hashlib as _hashlib
 import inspect as _inspect
+import os as _os
+import tempfile as _tempfile
 
+try:
+    from xxhash import xxh3_128 as _xxh3_128
+except ImportError:  # pragma: no cover
+    _xxh3_128 = None
 
 from .defaults import defaults
 
 
-def fix_attribute(attrib: str):
+def fix_attribute(attrib: str, options=None):
+    """
+    Translate a Python keyword argument name into an HTML/CSS attribute name.
+
+    `options` carries the translation flags, `defaults` when not given.
+    """
+    if options is None:
+        options = defaults
     if not isinstance(attrib, str):
         raise TypeError("Expected attrib to be str, got: {!r}".format(attrib))
-    if defaults.preserve_vendor_prefixes and attrib.startswith("_webkit_"):
+    if options.preserve_vendor_prefixes and attrib.startswith("_webkit_"):
         return "-webkit-" + attrib[8:]
-    if attrib == "cls" and defaults.replace_cls:
+    if attrib == "cls" and options.replace_cls:
         return "class"
-    elif attrib == "className" and defaults.replace_className:
+    elif attrib == "className" and options.replace_className:
         return "class"
-    if defaults.replace_double_underscore:
+    if options.replace_double_underscore:
         attrib = attrib.replace("__", "-")
-    if attrib.startswith("_") and defaults.remove_first_underscore:
+    if attrib.startswith("_") and options.remove_first_underscore:
         attrib = attrib[1:]
-    if defaults.replace_single_underscore:
+    if options.replace_single_underscore:
         attrib = attrib.replace("_", "-")
     return attrib
 
@@ -64,3 +78,45 @@ def get_local_variable_from_caller(name, _type):
             )
     finally:
         del frame
+
+
+def new_hash():
+    """
+    Return a fast streaming hash object with `update()` and `hexdigest()`.
+
+    Uses xxhash when it is installed, blake2b from the standard library otherwise.
+    """
+    if _xxh3_128 is not None:  # pragma: no cover
+        return _xxh3_128()
+    return _hashlib.blake2b(digest_size=16)
+
+
+def _read_umask():
+    # Reading the umask means setting it, so this is done once at import.
+    mask = _os.umask(0o022)
+    _os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def write_atomic(path, data, mode=0o644):
+    """
+    Write bytes `data` to `path` through a temporary file and `os.replace()`,
+    so readers never see a partially written file.
+
+    The file gets `mode` less the umask, as `open()` would give it,
+    so servers running as other users can read it.
+    """
+    directory = _os.path.dirname(path) or "."
+    _os.makedirs(directory, exist_ok=True)
+    fd, tmp = _tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with _os.fdopen(fd, "wb") as f:
+            f.write(data)
+        _os.chmod(tmp, mode & ~_UMASK)
+        _os.replace(tmp, path)
+    except BaseException:
+        _os.unlink(tmp)
+        raise
@@ -0,0 +1,105 @@
+import pickle
+
+import pytest
+from makeweb import CSS
+from makeweb.html import (
+    Doc,
+    Include,
+    Raw,
+    Text,
+    _input,
+    body,
+    div,
+    head,
+    img,
+    li,
+    style,
+    title,
+    ul,
+)
+
+
+def build():
+    css = CSS()
+    css("body", color="black")
+    doc = Doc("html", lang="mr")
+    with head():
+        title("Binary")
+        with style():
+            css.embed()
+    with body():
+        for n in range(50):
+            with div(cls="row", id="row-{}".format(n), tabindex=n):
+                img(src="{}.png".format(n))
+                _input(name="q", disabled=True, hidden=False)
+                Text("text {}".format(n))
+                Raw(b"<b>raw</b>")
+                Raw("<i>raw</i>")
+                with ul():
+                    [li("हा {}".format(m)) for m in range(5)]
+    return doc
+
+
+def test_dumps_loads_roundtrip():
+    doc = build()
+    data = doc.dumps()
+    assert isinstance(data, bytes)
+    loaded = Doc.loads(data)
+    assert str(loaded) == str(doc)
+    assert loaded.doctype == "html" and loaded.lang == "mr"
+    # The structure survives, not just the html.
+    row = loaded.elements[1].elements[0]
+    assert row.name == "div" and row.attrs["id"] == "row-0"
+    assert row.elements[1].attrs["disabled"] is True
+    assert Doc.loads(loaded.dumps()) is not loaded
+    assert loaded.dumps() == data
+
+
+def test_dumps_smaller_than_pickle():
+    doc = build()
+    assert len(doc.dumps()) < len(pickle.dumps(doc)) / 2
+
+
+def test_nested_doc_and_include(tmp_path):
+    vendor = tmp_path / "vendor.js"
+    vendor.write_text("var a = 1;")
+
+    def fragment():
+        doc = Doc()
+        div("inner")
+        return doc
+
+    doc = Doc()
+    div(fragment(), id="outer")
+    Include(str(vendor))
+    loaded = Doc.loads(doc.dumps())
+    assert str(loaded) == '<div id="outer"><div>inner</div></div>var a = 1;'
+    assert isinstance(loaded.elements[1], Include)
+
+
+def test_loads_rejects_garbage():
+    with pytest.raises(ValueError):
+        Doc.loads(b"NOPE" + bytes(16))
+    data = build().dumps()
+    # Truncated or padded input raises ValueError, never struct.error.
+    for end in (0, 5, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            Doc.loads(data[:end])
+    with pytest.raises(ValueError):
+        Doc.loads(data + b"\0")
+
+
+def test_attribute_values_roundtrip():
+    doc = Doc()
+    div(tabindex=1, value=2.5, title="1", hidden=None, checked=True)
+    loaded = Doc.loads(doc.dumps())
+    attrs = loaded.elements[0].attrs
+    assert attrs == {
+        "tabindex": 1,
+        "value": 2.5,
+        "title": "1",
+        "hidden": None,
+        "checked": True,
+    }
+    assert type(attrs["tabindex"]) is int and type(attrs["value"]) is float
+    assert str(loaded) == str(doc)
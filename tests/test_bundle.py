@@ -0,0 +1,63 @@
+def test_bundle_builds_once(tmp_path):
+    from makeweb import CSS, Doc
+    from makeweb.bundle import Bundle
+    from makeweb.html import style
+
+    calls = []
+
+    def build():
+        calls.append(1)
+        css = CSS()
+        css("body", color="green")
+        return css
+
+    first = Bundle(build, str(tmp_path), "style.css", source="v1")
+    assert first.built and calls == [1]
+    assert first.filename.startswith("style.") and first.filename.endswith(".css")
+    # Other workers attach to the published file without building.
+    second = Bundle(build, str(tmp_path), "style.css", source="v1")
+    assert not second.built and calls == [1]
+    assert second.path == first.path
+    assert bytes(second) == b"body{color:green}"
+    assert isinstance(second.data, memoryview)
+
+    doc = Doc()
+    with style():
+        second.embed()
+    assert b"".join(doc.iter_bytes()) == b"<style>body{color:green}</style>"
+
+    # A changed source is built again, the file is named after its content.
+    third = Bundle(build, str(tmp_path), "style.css", source="v2")
+    assert third.built and calls == [1, 1]
+    assert third.path == first.path
+
+    def build_other():
+        return "body{color:red}"
+
+    fourth = Bundle(build_other, str(tmp_path), "style.css", source="v3")
+    assert fourth.built and fourth.path != first.path
+
+
+def test_bundle_default_source(tmp_path):
+    from makeweb.bundle import Bundle
+
+    def build():
+        return "console.log(1);"
+
+    bundle = Bundle(build, str(tmp_path / "js"), "app.js")
+    assert str(bundle) == "console.log(1);"
+    assert Bundle(build, str(tmp_path / "js"), "app.js").path == bundle.path
+
+
+def test_bundle_empty(tmp_path):
+    from makeweb import Doc
+    from makeweb.bundle import Bundle
+    from makeweb.html import script
+
+    bundle = Bundle(lambda: "", str(tmp_path), "app.js", source="empty")
+    assert bytes(bundle) == b"" and len(bundle) == 0
+    doc = Doc()
+    with script():
+        bundle.embed()
+    assert str(doc) == "<script></script>"
+    assert b"".join(doc.iter_bytes()) == b"<script></script>"
@@ -0,0 +1,129 @@
+import multiprocessing
+import sqlite3
+
+import pytest
+from makeweb.cache import FragmentCache
+from makeweb.html import Doc, div, p
+
+
+def render_topic(text):
+    doc = Doc()
+    div(p(text), id="content-display")
+    return doc
+
+
+def test_fragment_cache(tmp_path):
+    cache = FragmentCache(str(tmp_path / "fragments.db"))
+    assert cache.get("home", "v1") is None
+    cache.set("home", "v1", render_topic("Hello"))
+    assert cache.get("home", "v1") == b'<div id="content-display"><p>Hello</p></div>'
+    assert cache.get("home", "v2") is None
+    cache.set("home", "v2", "<p>new</p>")
+    # Older versions of a key are replaced.
+    assert cache.get("home", "v1") is None
+    assert cache.stats() == (1, len("<p>new</p>"))
+    cache.delete("home")
+    assert cache.get("home", "v2") is None
+
+
+def test_fragment_cache_fragment(tmp_path):
+    cache = FragmentCache(str(tmp_path / "fragments.db"))
+    calls = []
+
+    def render(text):
+        calls.append(text)
+        return render_topic(text)
+
+    def page():
+        doc = Doc()
+        div(cache.fragment("topic", 1, render, "Hi"), id="page")
+        return str(doc)
+
+    expected = '<div id="page"><div id="content-display"><p>Hi</p></div></div>'
+    assert page() == expected
+    assert page() == expected
+    assert calls == ["Hi"]
+
+
+def test_fragment_cache_eviction(tmp_path):
+    import time
+
+    cache = FragmentCache(str(tmp_path / "fragments.db"), max_bytes=25)
+    cache.set("a", 1, "x" * 10)
+    time.sleep(0.01)
+    cache.set("b", 1, "y" * 10)
+    time.sleep(0.01)
+    cache.set("c", 1, "z" * 10)
+    assert cache.get("a", 1) is None
+    assert cache.get("b", 1) == b"y" * 10
+    assert cache.stats() == (2, 20)
+    cache.set("huge", 1, "w" * 100)  # Larger than the cache, not stored.
+    assert cache.get("huge", 1) is None
+    cache.clear()
+    assert cache.stats() == (0, 0)
+
+
+def _worker(args):
+    path, n = args
+    cache = FragmentCache(path)
+    cache.set("worker-{}".format(n), 1, "<p>{}</p>".format(n))
+    return [cache.get("worker-{}".format(m), 1) for m in range(4)]
+
+
+def test_fragment_cache_across_processes(tmp_path):
+    path = str(tmp_path / "fragments.db")
+    FragmentCache(path).set("shared", "v1", "<p>warm</p>")
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(4) as pool:
+        pool.map(_worker, [(path, n) for n in range(4)])
+        seen = pool.map(_worker, [(path, n) for n in range(4)])
+        warm = pool.starmap(FragmentCache(path).get, [("shared", "v1")] * 4)
+    for results in seen:
+        assert results == [b"<p>0</p>", b"<p>1</p>", b"<p>2</p>", b"<p>3</p>"]
+    assert warm == [b"<p>warm</p>"] * 4
+
+
+_inherited_cache = None
+
+
+def _drop_inherited(path):
+    import gc
+
+    from makeweb.cache import _inherited
+
+    global _inherited_cache
+    _inherited_cache = None
+    gc.collect()
+    cache = FragmentCache(path)
+    cache.set("child", 1, "<p>child</p>")
+    # The parent's connection is kept open, closing it here would drop
+    # the locks of the child's own connection.
+    return [
+        db.execute("SELECT COUNT(*) FROM fragments").fetchone()
+        for db in _inherited
+        if db.execute("PRAGMA database_list").fetchone()[2] == path
+    ]
+
+
+def test_fragment_cache_connections(tmp_path):
+    import gc
+
+    global _inherited_cache
+    path = str(tmp_path / "fragments.db")
+    _inherited_cache = FragmentCache(path)
+    _inherited_cache.get("a")
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(1) as pool:
+        assert pool.apply(_drop_inherited, (path,)) == [(1,)]
+    assert _inherited_cache.get("child", 1) == b"<p>child</p>"
+    # Connections are closed with their cache, not left to the collector.
+    cache = FragmentCache(path)
+    db = cache._connect()
+    gc.disable()
+    try:
+        del cache
+        with pytest.raises(sqlite3.ProgrammingError):
+            db.execute("SELECT 1")
+    finally:
+        gc.enable()
+    _inherited_cache = None
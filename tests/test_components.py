@@ -0,0 +1,129 @@
+import pytest
+from makeweb import component
+from makeweb.html import Doc, div, h1, hr, li, p, ul
+
+
+def test_component_splices_cached_html():
+    calls = []
+
+    @component(maxsize=4)
+    def footer(doc, count):
+        calls.append(count)
+        hr()
+        p("{} topics".format(count))
+
+    def page(count):
+        doc = Doc()
+        with div(id="page"):
+            h1("Wiki")
+            footer(doc, count)
+        return str(doc)
+
+    expected = '<div id="page"><h1>Wiki</h1><hr /><p>3 topics</p></div>'
+    assert page(3) == expected
+    assert page(3) == expected
+    assert calls == [3]
+    assert page(4) != expected
+    assert calls == [3, 4]
+    info = footer.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+    assert info.bytes == len("<hr /><p>3 topics</p>") + len("<hr /><p>4 topics</p>")
+
+
+def test_component_without_doc_argument():
+    @component
+    def items(names):
+        with ul():
+            [li(n) for n in names]
+
+    def page():
+        doc = Doc()
+        items(("a", "b"))
+        return str(doc)
+
+    assert page() == "<ul><li>a</li><li>b</li></ul>"
+    assert page() == "<ul><li>a</li><li>b</li></ul>"
+    assert items.cache_info().hits == 1
+
+
+def test_component_returning_doc_or_str():
+    @component()
+    def fragment(text):
+        doc = Doc()
+        p(text)
+        return doc
+
+    @component()
+    def text(value):
+        doc = Doc()
+        p(str(value))
+        return str(doc)
+
+    assert str(fragment("hi")) == "<p>hi</p>"
+    assert isinstance(fragment("hi"), Doc)
+    assert str(fragment("hi")) == "<p>hi</p>"
+    assert text(1) == text(1) == "<p>1</p>"
+    assert fragment.cache_info().hits == 2
+    assert text.cache_info().hits == 1
+
+
+def test_component_lru_eviction():
+    @component(maxsize=None, max_bytes=35)
+    def para(n):
+        doc = Doc()
+        p("x" * n)
+        return str(doc)
+
+    para(10)  # 17 bytes
+    para(5)  # 12 bytes
+    para(10)  # hit, becomes most recent
+    para(8)  # 15 bytes, evicts para(5)
+    info = para.cache_info()
+    assert info.currsize == 2
+    assert info.bytes == 32
+    para(5)
+    assert para.cache_info().misses == 4
+
+
+def test_component_ttl():
+    import time
+
+    @component(ttl=0.01)
+    def stamp(n):
+        return time.monotonic()
+
+    first = stamp(1)
+    assert stamp(1) == first
+    time.sleep(0.02)
+    assert stamp(1) != first
+
+
+def test_component_unhashable_arguments():
+    @component
+    def joined(items):
+        return ",".join(items)
+
+    assert joined(["a", "b"]) == "a,b"
+    assert joined.cache_info().currsize == 0
+    joined.cache_clear()
+    assert joined.cache_info().misses == 0
+
+
+def test_component_output_is_opaque_to_lookups():
+    from makeweb import Raw
+
+    @component
+    def card(title):
+        with div(id="card", cls="card"):
+            h1(title)
+
+    doc = Doc()
+    with div(id="page"):
+        card("Hello")
+    # The cached html renders, but its tags are not part of the tree.
+    assert str(doc) == (
+        '<div id="page"><div id="card" class="card"><h1>Hello</h1></div></div>'
+    )
+    assert isinstance(doc.by_id("page").elements[0], Raw)
+    assert doc.by_id("card") is None
+    assert doc.select("div.card") == []
@@ -0,0 +1,85 @@
+import gzip
+import zlib
+
+import pytest
+from makeweb import compression
+from makeweb.html import Doc, div, h1, p
+
+
+def build_doc():
+    doc = Doc("html")
+    with div(id="content"):
+        h1("Hello")
+        [p("Paragraph {}".format(n)) for n in range(2000)]
+    return doc
+
+
+def test_gzip_render_compressed():
+    doc = build_doc()
+    data = b"".join(doc.render_compressed("gzip"))
+    assert gzip.decompress(data).decode("utf-8") == str(doc)
+
+
+def test_render_compressed_yields_chunks():
+    doc = build_doc()
+    chunks = list(doc.render_compressed("gzip", level=1))
+    assert len(chunks) > 1
+    assert gzip.decompress(b"".join(chunks)).decode("utf-8") == str(doc)
+
+
+def test_br_render_compressed():
+    brotli = pytest.importorskip("brotli")
+    doc = build_doc()
+    data = b"".join(doc.render_compressed("br"))
+    assert brotli.decompress(data).decode("utf-8") == str(doc)
+
+
+def test_zstd_render_compressed():
+    zstandard = pytest.importorskip("zstandard")
+    doc = build_doc()
+    data = b"".join(doc.render_compressed("zstd"))
+    out = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    assert out.decode("utf-8") == str(doc)
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        compression.compressor("lzma")
+
+
+def test_frozen_doc_is_compressed_once():
+    doc = build_doc().freeze()
+    first = b"".join(doc.render_compressed("gzip"))
+    assert doc._compressed[("gzip", None)] == first
+    doc._compressed[("gzip", None)] = b"cached"
+    assert b"".join(doc.render_compressed("gzip")) == b"cached"
+
+
+def test_compress_cached():
+    css = "body{color:black}"
+    assert compression.compress_cached(css, "gzip") is compression.compress_cached(
+        css, "gzip"
+    )
+    assert gzip.decompress(compression.compress_cached(css, "gzip")) == css.encode()
+
+
+def test_negotiate():
+    assert compression.negotiate("") is None
+    assert compression.negotiate("identity") is None
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0.5, zstd;q=0.8") in ("zstd", "gzip")
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("gzip", offered=("br",)) is None
+    # q=0 refuses a codec, even when "*" would accept it.
+    assert compression.negotiate("gzip;q=0, deflate") is None
+    assert compression.negotiate("gzip;q=0, *", offered=("gzip",)) is None
+    assert compression.negotiate("br;q=0, *") != "br"
+    # "*" stands for any codec not listed.
+    first = next(c for c in compression.codecs if compression.available(c))
+    assert compression.negotiate("*") == first
+    assert compression.negotiate("*;q=0") is None
+    assert compression.negotiate("gzip;q=0.1, *;q=0.5", offered=("gzip",)) == "gzip"
+    assert compression.negotiate("gzip, *;q=0") == "gzip"
+    # Only identity is acceptable.
+    assert compression.negotiate("identity;q=1") is None
+    assert compression.negotiate("identity, *;q=0") is None
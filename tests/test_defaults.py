@@ -7,6 +7,7 @@ def test_defaults():
     assert defaults.replace_double_underscore is False
     assert defaults.replace_className is True
     assert defaults.replace_cls is True
+    assert defaults.mode == "default"
     assert defaults.void_tags == {
         "area",
         "base",
@@ -0,0 +1,73 @@
+import pytest
+from makeweb import Doc, Raw
+from makeweb.html import body, div, head, li, p, title, ul
+from makeweb.layout import Layout, slot
+from makeweb.profiles import XHTML
+
+
+def skeleton(profile=None):
+    doc = Doc("html", profile=profile)
+    with head():
+        title(slot("title", "Untitled"))
+    with body():
+        with div(cls="page"):
+            slot("content")
+        p(slot("title"))
+    return doc
+
+
+def items(n):
+    doc = Doc()
+    with ul():
+        [li(str(i)) for i in range(n)]
+    return doc
+
+
+def test_skeleton_renders_defaults():
+    assert str(skeleton()) == (
+        '<!doctype html><html lang="en"><head><title>Untitled</title></head>'
+        '<body><div class="page"></div><p></p></body></html>'
+    )
+
+
+def test_segments():
+    layout = Layout(skeleton())
+    assert layout.slots == ("title", "content")
+    assert layout.segments[1::2] == ["title", "content", "title"]
+    assert all(isinstance(s, bytes) for s in layout.segments[::2])
+
+
+def test_render():
+    layout = Layout(skeleton())
+    assert layout.render() == str(skeleton())
+    out = layout.render(title="Home", content=items(2))
+    assert "<title>Home</title>" in out
+    assert '<div class="page"><ul><li>0</li><li>1</li></ul></div>' in out
+    assert "<p>Home</p>" in out
+    assert layout.render(content=b"<b>x</b>", title=Raw.detached("R")).count("R") == 2
+
+
+def test_unknown_slot():
+    with pytest.raises(TypeError):
+        Layout(skeleton()).render(sidebar="x")
+
+
+def test_stream_is_lazy():
+    layout = Layout(skeleton())
+    calls = []
+
+    def content():
+        calls.append(1)
+        return items(1)
+
+    chunks = layout.stream(title="Lazy", content=content)
+    assert next(chunks).startswith(b"<!doctype html>")
+    assert not calls
+    rest = b"".join(chunks)
+    assert calls == [1]
+    assert b"<li>0</li>" in rest
+
+
+def test_profile():
+    layout = Layout(skeleton(XHTML))
+    assert layout.render(content=items(0)).startswith("<!DOCTYPE html PUBLIC")
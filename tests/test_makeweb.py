@@ -141,3 +141,392 @@ def test_text_escaping():
 
 def test_html_is_valid():
     pass
+
+
+def test_doc_etag():
+    from makeweb.html import Doc, h1
+
+    def render(text):
+        doc = Doc("html")
+        h1(text)
+        return doc
+
+    doc = render("Hello")
+    etag = doc.etag
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == render("Hello").etag
+    assert etag != render("Bye").etag
+    assert b"".join(doc.iter_bytes()) == str(doc).encode("utf-8")
+
+
+def test_doc_etag_follows_changes():
+    from makeweb.html import Doc, h1
+
+    doc = Doc()
+    h1("One")
+    before = doc.etag
+    h1("Two")
+    assert doc.etag != before
+
+
+def test_raw():
+    from makeweb.html import Doc, Raw, div
+
+    doc = Doc()
+    with div(id="content"):
+        Raw("<p>Pre-rendered</p>")
+    div(Raw(b"<p>bytes</p>"))
+    Raw(memoryview("<b>view</b>".encode()))
+    expected = (
+        '<div id="content"><p>Pre-rendered</p></div>'
+        "<div><p>bytes</p></div><b>view</b>"
+    )
+    assert str(doc) == expected
+    assert b"".join(doc.iter_bytes()) == expected.encode()
+    assert [type(c) for c in doc._chunks()].count(memoryview) == 1
+
+
+def test_raw_path(tmp_path):
+    import gzip
+    from makeweb.html import Doc, Raw, div
+
+    fragment = tmp_path / "fragment.html"
+    fragment.write_text("<article>मराठी</article>", encoding="utf-8")
+    empty = tmp_path / "empty.html"
+    empty.write_bytes(b"")
+    doc = Doc()
+    with div():
+        Raw(path=str(fragment))
+        Raw(path=str(empty))
+    assert str(doc) == "<div><article>मराठी</article></div>"
+    assert gzip.decompress(b"".join(doc.render_compressed())).decode() == str(doc)
+
+
+def test_raw_render_to():
+    import io
+    from makeweb.html import Doc, Raw, h1
+
+    doc = Doc()
+    h1("Title")
+    Raw(b"<p>body</p>")
+    sink = io.BytesIO()
+    assert doc.render_to(sink) == len(sink.getvalue())
+    assert sink.getvalue() == b"<h1>Title</h1><p>body</p>"
+
+
+def test_raw_validation():
+    from makeweb.html import Raw
+
+    with pytest.raises(TypeError):
+        Raw.detached(35)
+    with pytest.raises(TypeError):
+        Raw.detached()
+    assert str(Raw.detached("<br>")) == "<br>"
+
+
+def test_include(tmp_path):
+    import os
+    from makeweb.html import Doc, Include, script
+
+    vendor = tmp_path / "vendor.js"
+    vendor.write_text("var a = 1;")
+
+    def render():
+        doc = Doc()
+        with script():
+            Include(str(vendor))
+        return doc
+
+    assert str(render()) == "<script>var a = 1;</script>"
+    first = render()
+    mapped = list(first._chunks())[1].obj
+    assert list(render()._chunks())[1].obj is mapped  # Not reloaded.
+    digest = Include.detached(path=str(vendor)).digest
+
+    vendor.write_text("var b = 22;")
+    stat = os.stat(vendor)
+    os.utime(vendor, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert str(render()) == "<script>var b = 22;</script>"
+    assert Include.detached(path=str(vendor)).digest != digest
+
+
+def test_include_sendfile(tmp_path):
+    import socket
+    from makeweb.html import Doc, Include, style
+
+    sheet = tmp_path / "vendor.css"
+    sheet.write_text("body{color:black}")
+    doc = Doc()
+    with style():
+        Include(str(sheet))
+    expected = b"<style>body{color:black}</style>"
+
+    left, right = socket.socketpair()
+    with left, right:
+        assert doc.render_to(left) == len(expected)
+        assert right.recv(1024) == expected
+
+        sink = left.makefile("wb")
+        assert doc.render_to(sink) == len(expected)
+        sink.flush()
+        assert right.recv(1024) == expected
+
+
+def test_include_empty_and_replaced(tmp_path):
+    import os
+    import socket
+    from makeweb.html import Doc, Include, Raw, div, li
+
+    empty = tmp_path / "empty.js"
+    empty.write_bytes(b"")
+    assert str(Include.detached(path=str(empty))) == str(
+        Raw.detached(path=str(empty))
+    )
+
+    sheet = tmp_path / "sheet.css"
+    sheet.write_bytes(b"old")
+    doc = Doc()
+    with div():
+        Include(str(sheet))
+        [li(str(n)) for n in range(200)]
+    expected = b"".join(doc.iter_bytes())
+    # Replaced under the same mtime, the mapped file is still the one sent.
+    new = tmp_path / "new.css"
+    new.write_bytes(b"new")
+    stat = os.stat(sheet)
+    os.utime(new, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(new, sheet)
+
+    class Counting(socket.socket):
+        calls = 0
+
+        def sendall(self, data, *args):
+            Counting.calls += 1
+            return super(Counting, self).sendall(data, *args)
+
+    left, right = socket.socketpair()
+    with Counting(fileno=left.detach()) as sender, right:
+        assert doc.render_to(sender) == len(expected)
+        sender.shutdown(socket.SHUT_WR)
+        received = b""
+        while True:
+            data = right.recv(65536)
+            if not data:
+                break
+            received += data
+    assert received == expected
+    # Chunks around the included file are sent in one call each.
+    assert Counting.calls == 2
+
+
+def test_fast_mode():
+    import warnings
+    from makeweb import defaults
+    from makeweb.html import Doc, blink, div
+
+    doc = Doc(mode="fast")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        blink("no warning")
+    div(None, "ok")
+    assert str(doc) == "<blink>no warning</blink><div>ok</div>"
+
+    defaults.mode = "fast"
+    try:
+        assert Doc().mode == "fast"
+    finally:
+        defaults.mode = "default"
+    assert Doc().mode == "default"
+
+    with pytest.raises(ValueError):
+        Doc(mode="reckless")
+
+
+def test_strict_mode():
+    from makeweb.html import Doc, body, div, img, li, table, td, tr, ul
+    from makeweb.regions import region
+
+    doc = Doc("html", mode="strict")
+    with body():
+        ul(li("one"))
+        with ul():
+            li("two")
+        with table():
+            tr(td("cell"))
+    assert "<ul><li>one</li></ul><ul><li>two</li></ul>" in str(doc)
+
+    def item_in_div():
+        doc = Doc(mode="strict")
+        div(li("stray"))
+
+    def item_in_div_context():
+        doc = Doc(mode="strict")
+        with div():
+            li("stray")
+
+    def void_with_child():
+        doc = Doc(mode="strict")
+        img("child")
+
+    for render in (item_in_div, item_in_div_context, void_with_child):
+        with pytest.raises(ValueError):
+            render()
+
+    def stray_item(doctype):
+        doc = Doc(doctype, mode="strict")
+        li("item")
+        return doc
+
+    # Fragments may hold list items, they are checked where they end up.
+    assert str(stray_item("")) == "<li>item</li>"
+    with pytest.raises(ValueError):
+        str(stray_item("html"))
+    with pytest.raises(ValueError):
+        doc = Doc("html", mode="strict")
+        div(stray_item(""))
+    with pytest.raises(ValueError):
+        doc = Doc("html", mode="strict")
+        with region("items"):
+            li("stray")
+        str(doc)
+    with pytest.raises(ValueError):
+        doc = Doc("html", mode="strict")
+        with div():
+            with region("items"):
+                li("stray")
+    doc = Doc("html", mode="strict")
+    with body():
+        ul(stray_item(""))
+        with ul():
+            with region("items"):
+                li("placed")
+    assert "<ul><li>item</li></ul><ul><li>placed</li></ul>" in str(doc)
+
+
+def test_paged_list():
+    from makeweb.html import Doc, li, paged_list, decode_cursor
+
+    def page(items, cursor=None):
+        doc = Doc()
+        result = paged_list(
+            items, 2, lambda i: li(str(i)), cursor=cursor, endpoint="/items?q=x"
+        )
+        return str(doc), result
+
+    html, first = page(range(5))
+    assert html.startswith('<ul data-next="/items?q=x&cursor=Mg" ')
+    assert 'data-fragment="/items?q=x&cursor=Mg&fragment=1"' in html
+    assert "<li>0</li><li>1</li></ul>" in html
+    assert '<a rel="next" href="/items?q=x&cursor=Mg">Next</a>' in html
+    assert first.prev is None and first.count == 2
+    html, second = page(range(5), first.next)
+    assert "<li>2</li><li>3</li>" in html
+    assert 'rel="prev" href="/items?q=x&cursor=MA"' in html
+    html, last = page(range(5), second.next)
+    assert "<li>4</li></ul>" in html and last.next is None
+    assert "data-next" not in html
+    assert decode_cursor(last.cursor) == 4
+
+
+def test_paged_list_bounded():
+    from makeweb.html import Doc, li, paged_list
+
+    taken = []
+
+    def numbers():
+        n = 0
+        while True:
+            taken.append(n)
+            yield n
+            n += 1
+
+    def fetch(offset, limit):
+        return range(offset, offset + limit)
+
+    doc = Doc()
+    paged_list(numbers(), 3, lambda i: li(str(i)))
+    assert len(taken) == 4
+    page = paged_list(fetch, 3, lambda i: li(str(i)), cursor="MTAw")
+    assert "<li>100</li><li>101</li><li>102</li></ul>" in str(doc)
+    assert page.next is not None
+
+
+def test_paged_list_keyset():
+    from makeweb.html import Doc, decode_key_cursor, li, paged_list
+
+    topics = ["ant", "bee", "cat", "dog", "eel"]
+    calls = []
+
+    def after(start_after, limit):
+        calls.append(start_after)
+        return [t for t in topics if start_after is None or t > start_after][:limit]
+
+    doc = Doc()
+    first = paged_list(after, 2, li, key=lambda t: t, endpoint="/t")
+    assert decode_key_cursor(first.next) == "bee"
+    second = paged_list(after, 2, li, cursor=first.next, key=lambda t: t)
+    assert "<li>cat</li><li>dog</li>" in str(doc)
+    last = paged_list(after, 2, li, cursor=second.next, key=lambda t: t)
+    assert last.next is None and last.count == 1
+    assert calls == [None, "bee", "dog"]
+    with pytest.raises(TypeError):
+        paged_list(topics, 2, li, key=lambda t: t)
+    with pytest.raises(ValueError):
+        paged_list(after, 2, li, cursor="MTAw", key=lambda t: t)
+
+
+def test_paged_list_errors():
+    from makeweb.html import Doc, li, paged_list
+
+    doc = Doc()
+    with pytest.raises(ValueError):
+        paged_list([1], 0, li)
+    with pytest.raises(ValueError):
+        paged_list([1], 1, li, cursor="not a cursor")
+
+
+def test_render_limits():
+    from makeweb import RenderLimitExceeded
+    from makeweb.html import Doc, body, li, p, ul
+
+    def journal(n):
+        doc = Doc("html")
+        with body():
+            with ul():
+                for i in range(n):
+                    li("entry {}".format(i))
+        return doc
+
+    doc = journal(1000)
+    full = doc.render()
+    assert doc.render(max_bytes=len(full)) == full
+    with pytest.raises(RenderLimitExceeded) as error:
+        doc.render(max_bytes=200)
+    assert error.value.limit == "max_bytes"
+    assert 0 < error.value.written <= 200
+    with pytest.raises(RenderLimitExceeded) as error:
+        doc.render(deadline=-1)
+    assert error.value.limit == "deadline" and error.value.written == 0
+
+    truncated = doc.render(max_bytes=200, truncate=True)
+    assert '<div class="truncated" data-limit="max_bytes"></div>' in truncated
+    # Open tags are closed after the marker.
+    assert truncated.endswith("</ul></body></html>")
+    assert truncated.count("<li>") == truncated.count("</li>")
+    marker = doc.render(max_bytes=100, truncate="<b>…</b>")
+    assert "<b>…</b>" in marker and marker.endswith("</ul></body></html>")
+    # The marker and the closing tags fit within max_bytes.
+    for limit in range(0, 300, 7):
+        for truncate in (True, "<b>…</b>"):
+            out = doc.render(max_bytes=limit, truncate=truncate)
+            assert len(out.encode("utf-8")) <= limit
+    assert doc.render(max_bytes=len(full), truncate=True) == full
+    with pytest.raises(ValueError):
+        doc.render(parallel=2, max_bytes=200)
+
+    # Multi-byte text is counted in encoded bytes.
+    doc = Doc()
+    p("हा" * 10)
+    with pytest.raises(RenderLimitExceeded):
+        doc.render(max_bytes=40)
+    assert doc.render(max_bytes=67) == "<p>" + "हा" * 10 + "</p>"
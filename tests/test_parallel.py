@@ -0,0 +1,65 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+from makeweb import CSS
+from makeweb.html import Doc, Raw, Text, _input, body, div, head, img, li, style, ul
+from makeweb.parallel import pack, render, render_packed
+
+
+def build():
+    css = CSS()
+    css("body", color="black")
+    doc = Doc("html")
+    with head():
+        with style():
+            css.embed()
+    with body():
+        for n in range(20):
+            with div(cls="row", id="row-{}".format(n)):
+                img(src="{}.png".format(n))
+                _input(name="q", disabled=True)
+                Text("text {}".format(n))
+                Raw(b"<b>raw</b>")
+                with ul():
+                    [li("item {}".format(m)) for m in range(5)]
+    return doc
+
+
+def test_pack_roundtrip():
+    doc = build()
+    packed = [pack(e) for e in doc.elements]
+    assert pickle.loads(pickle.dumps(packed)) == packed
+    assert doc._header() + render_packed(packed) + doc._footer() == str(doc)
+
+
+def test_render_parallel_processes():
+    from concurrent.futures import ProcessPoolExecutor
+
+    from makeweb import parallel
+
+    doc = build()
+    assert render(doc, 2, min_nodes=0) == doc.render() == str(doc)
+    # The forked workers are kept for later renders.
+    pool = parallel._pools["fork", 2]
+    parallel.start(2)
+    assert render(doc, 2, min_nodes=0) == str(doc)
+    assert parallel._pools["fork", 2] is pool
+    # A process pool of the caller gets packed subtrees.
+    with ProcessPoolExecutor(2) as pool:
+        assert render(doc, 2, executor=pool, min_nodes=0) == str(doc)
+    # Small documents are rendered serially.
+    assert doc.render(parallel=2) == str(doc)
+
+
+def test_render_parallel_threads():
+    doc = build()
+    with ThreadPoolExecutor(3) as pool:
+        assert render(doc, 3, executor=pool, min_nodes=0) == str(doc)
+
+
+def test_render_parallel_small_doc():
+    doc = Doc()
+    div("only")
+    assert doc.render(parallel=4) == "<div>only</div>"
+    empty = Doc()
+    assert empty.render(parallel=4) == ""
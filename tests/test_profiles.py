@@ -0,0 +1,116 @@
+import pickle
+import threading
+
+import pytest
+from makeweb import Doc
+from makeweb.html import _input, body, br, div, p
+from makeweb.profiles import AMP, EMAIL, HTML5, XHTML, Profile, profiles
+
+
+def build(profile):
+    doc = Doc("html", profile=profile)
+    with body():
+        br()
+        _input(_type="checkbox", checked=True, hidden=False)
+        p("text", cls="x", data_id=1)
+    return doc
+
+
+def test_html5():
+    out = str(build(HTML5))
+    assert out.startswith('<!doctype html><html lang="en">')
+    assert "<br>" in out
+    assert '<input type="checkbox" checked>' in out
+    assert "hidden" not in out
+    assert '<p class="x" data-id="1">text</p>' in out
+
+
+def test_xhtml():
+    out = str(build(XHTML))
+    assert '<html xmlns="http://www.w3.org/1999/xhtml" lang="en">' in out
+    assert "XHTML 1.0 Strict" in out
+    assert "<br />" in out
+    assert '<input type="checkbox" checked="checked" />' in out
+    assert "XHTML 1.0 Transitional" in str(build(EMAIL))
+
+
+def test_amp():
+    assert '<html ⚡ lang="en">' in str(build(AMP))
+
+
+def test_no_profile_is_unchanged():
+    doc = Doc("html")
+    br()
+    _input(checked=True)
+    assert str(doc) == '<!doctype html><html lang="en"><br /><input checked /></html>'
+
+
+def fragment():
+    doc = Doc()
+    br()
+    return doc
+
+
+def test_fragment_follows_document_profile():
+    part = fragment()
+    doc = Doc("html", profile=XHTML)
+    with div():
+        doc.elements.append(part)
+    assert "<div><br /></div>" in str(doc)
+    assert str(part) == "<br />"
+    doc = Doc("html", profile=HTML5)
+    doc.elements.append(part)
+    assert "<br></html>" in str(doc)
+
+
+def test_custom_profile():
+    profile = Profile("legacy", replace_single_underscore=False, void_tags={"br"})
+    doc = Doc(profile=profile)
+    div(data_id=1)
+    br()
+    assert str(doc) == '<div data_id="1"></div><br>'
+
+
+def test_immutable():
+    with pytest.raises(AttributeError):
+        HTML5.self_closing = " />"
+    with pytest.raises(AttributeError):
+        HTML5.anything = 1
+
+
+def test_pickle():
+    profile = pickle.loads(pickle.dumps(XHTML))
+    assert profile.self_closing == " />"
+    assert str(build(profile)) == str(build(XHTML))
+    assert set(profiles) == {"html5", "xhtml", "amp", "email"}
+
+
+def test_concurrent_profiles():
+    results = {}
+
+    def run(profile):
+        results[profile.name] = [str(build(profile)) for _ in range(50)]
+
+    threads = [threading.Thread(target=run, args=(p,)) for p in (HTML5, XHTML)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert set(results["html5"]) == {str(build(HTML5))}
+    assert set(results["xhtml"]) == {str(build(XHTML))}
+
+
+def test_binary_and_parallel():
+    from concurrent.futures import ThreadPoolExecutor
+    from makeweb.parallel import render
+
+    doc = build(XHTML)
+    assert str(Doc.loads(doc.dumps())) == str(doc)
+    with ThreadPoolExecutor(2) as executor:
+        assert render(doc, 2, executor, min_nodes=0) == str(doc)
+    # Profiles that are not registered keep their options.
+    custom = Profile("custom", self_closing=" />", void_tags={"br", "widget"})
+    doc = build(custom)
+    loaded = Doc.loads(doc.dumps())
+    assert loaded.profile.self_closing == " />"
+    assert loaded.profile.void_tags == frozenset({"br", "widget"})
+    assert str(loaded) == str(doc)
+    assert Doc.loads(build(XHTML).dumps()).profile is XHTML
@@ -0,0 +1,64 @@
+import pytest
+from makeweb.html import Doc, Raw, Text, _input, a, body, div, form, li, p, span, ul
+from makeweb.query import parse
+
+
+def build():
+    doc = Doc("html")
+    with body():
+        with div(id="content-wrap", cls="page main"):
+            with form(action="/save", method="post"):
+                _input(name="topic")
+            with ul(id="results"):
+                li(a("one", href="/one"), cls="bit")
+                li(span("two"), cls="bit hot")
+            p("Footer", cls="bit")
+        with form(action="/search"):
+            _input(name="query", type="text")
+        Text("not a tag")
+    return doc
+
+
+def test_by_id_class_tag():
+    doc = build()
+    assert doc.by_id("content-wrap").name == "div"
+    assert doc.by_id("missing") is None
+    assert [n.name for n in doc.by_class("bit")] == ["li", "li", "p"]
+    assert [n.attrs["action"] for n in doc.by_tag("form")] == ["/save", "/search"]
+    assert doc.by_tag("text") == []
+
+
+def test_select():
+    doc = build()
+    assert [n.name for n in doc.select("li.bit")] == ["li", "li"]
+    assert [n.name for n in doc.select(".bit.hot")] == ["li"]
+    assert [n.name for n in doc.select("#results > li span")] == ["span"]
+    assert [n.name for n in doc.select("div.page p")] == ["p"]
+    assert doc.select("body > p") == []
+    assert [n.attrs["name"] for n in doc.select("input[type=text]")] == ["query"]
+    assert len(doc.select("input[name]")) == 2
+    # Groups come back in document order without duplicates.
+    assert [n.name for n in doc.select("p, #results, li.hot, ul")] == ["ul", "li", "p"]
+    assert len(doc.select("*")) == 12
+
+
+def test_select_unsupported():
+    with pytest.raises(ValueError):
+        parse("li:hover")
+    with pytest.raises(ValueError):
+        parse("a ~ b")
+
+
+def test_index_invalidation():
+    doc = build()
+    assert len(doc.by_tag("form")) == 2
+    with body():
+        form(action="/late")
+    assert len(doc.by_tag("form")) == 3
+
+    # Post-processing, for example injecting a CSRF token into every form.
+    for f in doc.select("form"):
+        f.elements.append(Raw.detached('<input type="hidden" name="csrf" />'))
+        f.attrs["data-csrf"] = "token"
+    doc.invalidate()
+    assert len(doc.select("form[data-csrf=token]")) == 3
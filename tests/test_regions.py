@@ -0,0 +1,132 @@
+import pytest
+from makeweb import Doc
+from makeweb.html import body, div, h1, li, p, ul
+from makeweb.regions import Region, Registry, default_registry, region, render
+
+pages = Registry()
+
+
+@pytest.fixture(autouse=True)
+def forget_regions():
+    pages.clear()
+    default_registry.clear()
+    yield
+
+
+def test_with_region_is_transparent():
+    doc = Doc("html")
+    with body():
+        h1("Title")
+        with region("items"):
+            with ul():
+                li("one")
+    assert str(doc) == (
+        '<!doctype html><html lang="en"><body><h1>Title</h1>'
+        "<ul><li>one</li></ul></body></html>"
+    )
+    assert doc.render(region="items") == "<ul><li>one</li></ul>"
+    assert doc.by_tag("li")[0].elements == ["one"]
+    with pytest.raises(LookupError):
+        doc.render(region="missing")
+
+
+calls = []
+
+
+@region("test-sidebar", pages)
+def sidebar(doc):
+    calls.append("sidebar")
+    p("sidebar")
+
+
+@region("test-footer", pages)
+def footer():
+    calls.append("footer")
+    doc = Doc()
+    p("footer")
+    return doc
+
+
+def page(show_log):
+    doc = Doc("html")
+    with body():
+        sidebar(doc)
+        with div(id="main"):
+            with region("test-log", pages):
+                calls.append("log")
+                if show_log:
+                    li("entry")
+        calls.append("after")
+        div(footer())
+    return doc
+
+
+def test_decorated_regions():
+    doc = page(True)
+    assert '<body><p>sidebar</p><div id="main"><li>entry</li></div>' in str(doc)
+    assert "<div><p>footer</p></div>" in str(doc)
+    assert doc.render(region="test-sidebar") == "<p>sidebar</p>"
+    assert doc.render(region="test-footer") == "<p>footer</p>"
+
+
+def test_render_skips_and_exits_early():
+    page(True)  # Learn which regions contain which.
+    del calls[:]
+    assert render("test-log", page, True) == "<li>entry</li>"
+    # The sidebar was skipped, nothing after the region ran.
+    assert calls == ["log"]
+    del calls[:]
+    assert render("test-footer", page, False) == "<p>footer</p>"
+    assert calls == ["log", "after", "footer"]
+
+
+def test_render_falls_back_to_full_run():
+    @region("test-outer")
+    def outer(doc, nested):
+        if nested:
+            with region("test-inner"):
+                p("inner")
+
+    def build(nested):
+        doc = Doc()
+        outer(doc, nested)
+        return doc
+
+    build(False)
+    assert render("test-inner", build, True) == "<p>inner</p>"
+    with pytest.raises(LookupError):
+        render("test-inner", build, False)
+
+
+def test_region_node():
+    doc = Doc()
+    with region("x") as node:
+        p("x")
+    assert isinstance(node, Region) and node.name == "x"
+    assert doc.elements == [node]
+
+
+def test_registries_are_separate():
+    other = Registry()
+    seen = []
+
+    @region("test-box", other)
+    def empty_box(doc):
+        pass
+
+    @region("test-box", pages)
+    def box(doc):
+        seen.append("box")
+        with region("test-item", pages):
+            p("item")
+
+    def build(helper):
+        doc = Doc()
+        helper(doc)
+        return doc
+
+    build(empty_box)
+    assert other.observed == {"test-box"} and not pages.observed
+    # The unrelated "test-box" did not make this one be skipped first.
+    assert render("test-item", build, box) == "<p>item</p>"
+    assert seen == ["box"]
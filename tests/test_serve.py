@@ -0,0 +1,206 @@
+import asyncio
+import gzip
+
+import pytest
+from makeweb.html import Doc, h1
+
+
+def render():
+    doc = Doc("html")
+    h1("Hello, Serve")
+    return doc
+
+
+def test_flask_response():
+    flask = pytest.importorskip("flask")
+    from makeweb.serve import flask_response
+
+    app = flask.Flask(__name__)
+
+    @app.route("/")
+    def index():
+        return flask_response(render())
+
+    client = app.test_client()
+    plain = client.get("/")
+    assert plain.headers.get("Content-Encoding") is None
+    assert plain.data.decode() == str(render())
+
+    packed = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(packed.data).decode() == str(render())
+
+
+def test_quart_response():
+    quart = pytest.importorskip("quart")
+    from makeweb.serve import quart_response
+
+    app = quart.Quart(__name__)
+
+    @app.route("/")
+    async def index():
+        return quart_response(render())
+
+    async def fetch():
+        client = app.test_client()
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+        return response.headers["Content-Encoding"], await response.get_data()
+
+    encoding, data = asyncio.run(fetch())
+    assert encoding == "gzip"
+    assert gzip.decompress(data).decode() == str(render())
+
+
+def test_flask_etag_not_modified():
+    flask = pytest.importorskip("flask")
+    from makeweb.serve import flask_response
+
+    app = flask.Flask(__name__)
+
+    @app.route("/")
+    def index():
+        return flask_response(render(), etag=True)
+
+    client = app.test_client()
+    first = client.get("/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag == render().etag
+    second = client.get("/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.data == b""
+
+
+def test_flask_version_skips_render():
+    flask = pytest.importorskip("flask")
+    from makeweb.serve import etag_for, flask_response
+
+    app = flask.Flask(__name__)
+    calls = []
+
+    def page():
+        calls.append(1)
+        return render()
+
+    @app.route("/")
+    def index():
+        return flask_response(page, version="topic-v1")
+
+    client = app.test_client()
+    first = client.get("/")
+    assert first.status_code == 200
+    assert first.headers["ETag"] == etag_for("topic-v1")
+    assert len(calls) == 1
+    second = client.get("/", headers={"If-None-Match": etag_for("topic-v1")})
+    assert second.status_code == 304
+    assert len(calls) == 1
+    assert second.headers["Vary"] == "Accept-Encoding"
+    # The gzip representation has its own tag.
+    packed = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["ETag"] != first.headers["ETag"]
+    stale = client.get(
+        "/",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]},
+    )
+    assert stale.status_code == 200
+
+
+def test_encode_body_yields_bytes(tmp_path):
+    import mmap
+
+    from makeweb import CSS
+    from makeweb.html import Include, Raw, style
+    from makeweb.serve import encode_body
+
+    vendor = tmp_path / "vendor.js"
+    vendor.write_bytes(b"var a = 1;")
+    css = CSS()
+    css("body", color="red")
+    doc = Doc()
+    h1("hi")
+    Include(str(vendor))
+    with open(str(vendor), "rb") as f:
+        Raw(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    Raw(memoryview(b"<hr>"))
+    with style():
+        css.embed()
+    for accept in ("", "gzip"):
+        body, _ = encode_body(doc, accept)
+        chunks = list(body)
+        assert {type(c) for c in chunks} == {bytes}
+    assert b"".join(encode_body(doc, "")[0]) == b"".join(doc.iter_bytes())
+
+
+def test_not_modified():
+    from makeweb.serve import not_modified
+
+    assert not not_modified('"a"', "")
+    assert not_modified('"a"', '"b", "a"')
+    assert not_modified('"a"', 'W/"a"')
+    assert not_modified('"a"', "*")
+    assert not not_modified('"a"', '"b"')
+
+
+def publish(tmp_path):
+    from makeweb import CSS
+
+    css = CSS()
+    css("body", color="#000000", margin="0px")
+    return css.publish(str(tmp_path), url="/assets/")
+
+
+def test_css_publish(tmp_path):
+    link = publish(tmp_path)
+    assert link.name == "link" and not link.close
+    href = link.attrs["href"]
+    assert href.startswith("/assets/style.") and href.endswith(".css")
+    assert str(link) == '<link rel="stylesheet" href="{}" />'.format(href)
+    path = tmp_path / href.rsplit("/", 1)[1]
+    assert path.read_bytes() == b"body{color:#000;margin:0}"
+    assert gzip.decompress((tmp_path / (path.name + ".gz")).read_bytes()) == (
+        path.read_bytes()
+    )
+    # Same content, same name.
+    assert publish(tmp_path).attrs["href"] == href
+
+
+def test_flask_static(tmp_path):
+    flask = pytest.importorskip("flask")
+    from makeweb.serve import IMMUTABLE, flask_static
+
+    name = publish(tmp_path).attrs["href"].rsplit("/", 1)[1]
+    app = flask.Flask(__name__)
+
+    @app.route("/assets/<name>")
+    def assets(name):
+        return flask_static(str(tmp_path), name)
+
+    client = app.test_client()
+    plain = client.get("/assets/" + name)
+    assert plain.data == b"body{color:#000;margin:0}"
+    assert plain.headers["Cache-Control"] == IMMUTABLE
+    assert plain.mimetype == "text/css"
+    packed = client.get("/assets/" + name, headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.data) == plain.data
+    again = client.get(
+        "/assets/" + name, headers={"If-None-Match": plain.headers["ETag"]}
+    )
+    assert again.status_code == 304
+    assert client.get("/assets/missing.css").status_code == 404
+    assert client.get("/assets/..%2Ftest_serve.py").status_code == 404
+    assert packed.headers["ETag"] != plain.headers["ETag"]
+    # Files without a content hash in the name are revalidated.
+    import os
+
+    other = tmp_path / "logo.svg"
+    other.write_bytes(b"<svg/>")
+    first = client.get("/assets/logo.svg")
+    assert first.headers["Cache-Control"] == "no-cache"
+    other.write_bytes(b"<svg></svg>")
+    os.utime(str(other), ns=(0, 10**9))
+    second = client.get(
+        "/assets/logo.svg", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert second.status_code == 200 and second.data == b"<svg></svg>"
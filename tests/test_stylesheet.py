@@ -52,3 +52,461 @@ def test_css_media_query_with_string_value():
     css = CSS()
     css("@media print", body="display: none")
     assert str(css) == "@media print{}"
+
+
+def test_css_cached_forms():
+    import gzip
+
+    css = CSS()
+    css("body", color="green")
+    text = str(css)
+    assert str(css) is text
+    assert bytes(css) == b"body{color:green}"
+    assert bytes(css) is bytes(css)
+    assert gzip.decompress(css.compressed("gzip")) == bytes(css)
+    assert css.compressed("gzip") is css.compressed("gzip")
+    css("p", margin=0)
+    assert str(css) == "body{color:green}p{margin:0}"
+    assert gzip.decompress(css.compressed("gzip")) == bytes(css)
+    css.style.append("a{color:red}")
+    css.invalidate()
+    assert str(css).endswith("a{color:red}")
+
+
+def test_css_pickle_and_deepcopy():
+    import copy
+    import pickle
+
+    css = CSS(optimize=True)
+    css("body", color="green")
+    css("p", margin=0)
+    text = str(css)
+    for other in (pickle.loads(pickle.dumps(css)), copy.deepcopy(css)):
+        assert str(other) == text
+        other.style.append("a{color:red}")
+        other.override("p", margin="1px")
+        assert str(other) == "body{color:green}p{margin:1px}a{color:red}"
+        assert str(css) == text
+    doc = Doc()
+    with style():
+        css.embed()
+    assert str(pickle.loads(pickle.dumps(doc))) == str(doc)
+
+
+def test_css_embed_renders_cached_bytes():
+    import pickle
+
+    css = CSS()
+    css("body", color="green")
+    doc = Doc()
+    with style():
+        css.embed()
+    assert b"".join(doc.iter_bytes()) == b"<style>body{color:green}</style>"
+    # Rules added after embedding still show up.
+    css("p", margin=0)
+    assert str(doc) == "<style>body{color:green}p{margin:0}</style>"
+    # str(doc) reuses the cached str instead of decoding the bytes.
+    assert list(doc.iter_render())[1] is str(css)
+    assert pickle.loads(pickle.dumps(bytes(css))) == bytes(css)
+
+
+def test_css_optimize_merges_and_dedupes():
+    css = CSS()
+    css("nav button", padding="0.5rem", color="#FFFFFF")
+    css("p", margin="0px")
+    css("nav button", border="none", color="#336699")
+    css("nav button", padding="0.5rem")
+    savings = css.optimize()
+    assert str(css) == "nav button{border:none;color:#369;padding:.5rem}p{margin:0}"
+    assert savings.before > savings.after
+    assert savings.saved == savings.before - len(str(css))
+    assert css.savings == savings
+
+
+def test_css_optimize_keeps_custom_properties_and_urls():
+    css = CSS()
+    css(":root", **{"--gap": "0px"})
+    css(".a", margin="calc(var(--gap) + 1rem)", padding="0px")
+    css(".b", background="url(img/0px.png) #FFFFFF", content="'0px'")
+    css.optimize()
+    assert str(css) == (
+        ":root{--gap:0px}.a{margin:calc(var(--gap) + 1rem);padding:0}"
+        ".b{background:url(img/0px.png) #fff;content:'0px'}"
+    )
+
+
+def test_css_optimize_many_rules():
+    import time
+
+    css = CSS()
+    for n in range(2000):
+        css(".c{}".format(n), color="#{:06x}".format(n), margin="{}px".format(n % 7))
+    css(".c0", padding=0)
+    start = time.perf_counter()
+    css.optimize()
+    # Merging looks up earlier rules by key instead of comparing with each.
+    assert time.perf_counter() - start < 1
+    assert str(css).count(".c0{") == 1
+
+
+def test_css_optimize_keeps_cascade():
+    css = CSS()
+    css(".a", color="red")
+    css(".b", color="blue")
+    # Moving this up would let .b win over it, so it stays.
+    css(".a", color="green")
+    css.optimize()
+    assert str(css) == ".a{color:red}.b{color:blue}.a{color:green}"
+    # margin-top and margin interact as well.
+    css = CSS()
+    css(".a", margin_top="1px")
+    css(".b", margin="0")
+    css(".a", margin_top="2px")
+    css.optimize()
+    assert str(css).count(".a{") == 2
+
+
+def test_css_optimize_shorthands():
+    pairs = [
+        ("font", "line-height"),
+        ("inset", "top"),
+        ("grid-area", "grid-row-start"),
+        ("place-items", "align-items"),
+        ("list-style", "list-style-type"),
+        ("border-width", "border-top"),
+        ("margin-inline-start", "margin-left"),
+        ("grid-gap", "row-gap"),
+        ("-webkit-unknown-thing", "color"),
+    ]
+    for first, second in pairs:
+        for a, b in ((first, second), (second, first)):
+            css = CSS()
+            css(".a", **{a: "1"})
+            css(".b", **{b: "2"})
+            css(".a", **{a: "3"})
+            css.optimize()
+            assert str(css).count(".a{") == 2, (a, b)
+    # Unrelated longhands still merge.
+    css = CSS()
+    css(".a", font_size="1rem")
+    css(".b", font_weight="bold", **{"--custom": "1"})
+    css(".a", font_size="2rem")
+    css.optimize()
+    assert str(css).count(".a{") == 1
+
+
+def test_css_optimize_groups_and_fallbacks():
+    css = CSS()
+    css("h1", font_weight="bold")
+    css(".lead", font_size="2rem")
+    css("h2", font_weight="bold")
+    css(".box", display="-webkit-box")
+    css(".box", display="flex")
+    css(".box", display="flex")
+    css.optimize()
+    assert str(css) == (
+        "h1,h2{font-weight:bold}.lead{font-size:2rem}"
+        ".box{display:-webkit-box;display:flex}"
+    )
+
+
+def test_css_optimize_media_and_keyframes():
+    css = CSS()
+    css("@media (max-width: 600px)", **{"body": {"font-size": "14px"}})
+    css("@keyframes fade", **{"0%": {"opacity": "0"}})
+    css("p", color="red")
+    css("@media (max-width: 600px)", **{"body": {"padding": "0px"}})
+    css.optimize()
+    assert str(css) == (
+        "@media (max-width: 600px){body{font-size:14px;padding:0}}"
+        "@keyframes fade{0%{opacity:0}}p{color:red}"
+    )
+
+
+def test_css_optimize_flag():
+    css = CSS(optimize=True)
+    css("a", color="#000000")
+    css("a", color="#ffffff")
+    assert str(css) == "a{color:#fff}"
+    assert css.savings.saved > 0
+    css("b", margin="0em")
+    assert str(css) == "a{color:#fff}b{margin:0}"
+
+
+def test_css_for_doc():
+    from makeweb import Raw
+    from makeweb.html import a, body, div, h1, p
+
+    css = CSS()
+    css("html, body", margin=0)
+    css("h1", font_size="2rem")
+    css("#content-box", width="100%")
+    css(".navli a:hover", color="red")
+    css("nav .container, div.page > p", padding=0)
+    css("#content-display a", color="blue")
+    css("p:not(.lead)", margin=0)
+    css("@media (max-width: 600px)", **{"#content-box": {"width": "auto"}})
+    css("@media print", **{"h1": {"display": "none"}})
+    css("@keyframes spin", **{"to": {"opacity": "0"}})
+    css("@keyframes fade", **{"to": {"opacity": "0"}})
+    css(".page", animation="fade 1s")
+
+    def page():
+        doc = Doc("html")
+        with body():
+            h1("Search")
+            with div(cls="page"):
+                p("results")
+                div(Raw('<a href="/x">x</a>'), id="content-display")
+        return doc
+
+    doc = page()
+    shaken = css.for_doc(doc)
+    assert str(shaken) == (
+        "html, body{margin:0}h1{font-size:2rem}"
+        "nav .container, div.page > p{padding:0}#content-display a{color:blue}"
+        "p:not(.lead){margin:0}@media print{h1{display:none}}"
+        "@keyframes fade{to{opacity:0}}.page{animation:fade 1s}"
+    )
+    # Pages of the same shape share the subset, until the stylesheet changes.
+    assert css.for_doc(page()) is shaken
+    css("h1", color="black")
+    assert css.for_doc(page()) is not shaken
+    assert "color:black" in str(css.for_doc(page()))
+
+
+def test_css_embed_critical():
+    from makeweb.html import body, h1, head
+
+    css = CSS()
+    css("h1", color="red")
+    css("#unused", color="blue")
+    doc = Doc("html")
+    with head():
+        with style():
+            css.embed(critical=True)
+    with body():
+        h1("Title")
+    assert "<style>h1{color:red}</style>" in str(doc)
+
+
+def test_css_override():
+    css = CSS()
+    css("body", color="black", margin=0)
+    css("@media print", **{"body": {"color": "black"}})
+    css("p", color="gray")
+    css.override("body", color="white", margin=None, font_size="1rem")
+    css.override("@media print", **{"body": {"color": "gray"}, "p": {"margin": 0}})
+    css.override("a", color="blue")
+    assert str(css) == (
+        "body{color:white;font-size:1rem}"
+        "@media print{body{color:gray};p{margin:0}}p{color:gray}a{color:blue}"
+    )
+
+
+def test_css_copy_and_merge():
+    base = CSS()
+    base("body", color="black", background="white")
+    base("@media print", **{"body": {"color": "black"}})
+    dark = base.copy()
+    dark.override("body", color="white", background="black")
+    assert str(base) == (
+        "body{color:black;background:white}@media print{body{color:black}}"
+    )
+    assert str(dark).startswith("body{color:white;background:black}")
+    theme = CSS()
+    theme("body", color="red")
+    theme("@media print", **{"h1": {"display": "none"}})
+    theme("footer", display="none")
+    assert base.merge(theme) is base
+    assert str(base) == (
+        "body{color:red;background:white}"
+        "@media print{body{color:black};h1{display:none}}footer{display:none}"
+    )
+
+
+def test_css_style_edits():
+    css = CSS()
+    style = css.style
+    css("p", margin=0)
+    # Edits apply right away, also through a list fetched earlier.
+    style.append("a{color:red}")
+    assert str(css) == "p{margin:0}a{color:red}"
+    assert css.rules[-1].props == {"color": "red"}
+    del css.style[0]
+    assert str(css) == "a{color:red}"
+    css.override("a", color="blue")
+    assert css.style == ["a{color:blue}"]
+    css.rules[-1].props["color"] = "green"
+    css.invalidate()
+    assert str(css) == "a{color:green}"
+
+
+def test_css_style_round_trip():
+    css = CSS()
+    css.style = ["a{color:red}", ".box{display:-webkit-box;display:flex}"]
+    assert css.rules[1].props == {"display": ("-webkit-box", "flex")}
+    assert str(css) == "a{color:red}.box{display:-webkit-box;display:flex}"
+    css.override(".box", display="grid")
+    assert str(css) == "a{color:red}.box{display:grid}"
+
+
+def test_css_scoped():
+    from makeweb.html import li, ul
+    from makeweb.utilities import new_hash
+
+    css = CSS()
+    sent = css.scoped("chat-sent", color="white", **{"&:hover": {"color": "red"}})
+    log = css.scoped("chat-log", list_style="none")
+    assert sent != log and len(sent) == 7
+    assert sent.name == "chat-sent"
+    assert css.scoped("chat-sent", color="blue") == sent
+    assert str(css) == (
+        "{0}{{color:blue}}{0}:hover{{color:red}}{1}{{list-style:none}}".format(
+            sent.selector, log.selector
+        )
+    )
+    # A name whose short hash is taken by another name gets a longer one.
+    digest = new_hash()
+    digest.update("{}\0other".format(css.namespace).encode("utf-8"))
+    digest = digest.hexdigest()
+    css._tokens["c" + digest[:6]] = "colliding"
+    assert css.scoped("other", color="red") == "c" + digest[:7]
+    doc = Doc()
+    with ul(cls=log):
+        li("hi", cls=[sent, None, "extra"])
+    assert str(doc) == '<ul class="{}"><li class="{} extra">hi</li></ul>'.format(
+        log, sent
+    )
+    # Each stylesheet scopes its names apart, copies keep their classes.
+    first = CSS()
+    second = CSS()
+    assert first.scoped("chat-log") != second.scoped("chat-log")
+    assert CSS(namespace="chat").scoped("chat-log") == CSS(
+        namespace="chat"
+    ).scoped("chat-log")
+    assert css.copy().scoped("chat-log") == log
+
+
+def test_css_atoms():
+    import pytest
+    from makeweb.html import div
+    from makeweb.stylesheet import style_atoms
+
+    with pytest.raises(ValueError):
+        CSS().atoms(display="flex")
+    css = CSS(atomic=True)
+    flex, center = style_atoms(css, display="flex", align_items="center")
+    assert flex.name == "display:flex"
+    assert css.atoms(display="flex") == (flex,)
+    css.atoms(align_items="center", color="red")
+    assert len(css.rules) == 3
+    assert str(css).startswith(
+        "{}{{display:flex}}{}{{align-items:center}}".format(
+            flex.selector, center.selector
+        )
+    )
+    doc = Doc()
+    div("x", cls=style_atoms(css, display="flex", align_items="center"))
+    assert str(doc) == '<div class="{} {}">x</div>'.format(flex, center)
+
+
+def test_css_nested():
+    import pytest
+
+    css = CSS(theme={"accent": "#369", "gap": "1rem"})
+    css(
+        "nav a, footer a",
+        color="$accent",
+        padding="0 $gap",
+        **{
+            "&:hover": {"color": "black"},
+            "span": {"margin": 0},
+            "@media (max-width: 600px)": {
+                "padding": 0,
+                "@media print": {"display": "none"},
+            },
+        },
+    )
+    assert str(css) == (
+        "nav a, footer a{color:#369;padding:0 1rem}"
+        "nav a:hover,footer a:hover{color:black}"
+        "nav a span,footer a span{margin:0}"
+        "@media (max-width: 600px){nav a, footer a{padding:0}}"
+        "@media print and (max-width: 600px){nav a, footer a{display:none}}"
+    )
+    css.override("nav a, footer a", color="$gap")
+    assert str(css).startswith("nav a, footer a{color:1rem;")
+    with pytest.raises(KeyError):
+        css("p", color="$missing")
+    # The media type comes first, conflicting types can not be nested.
+    css = CSS()
+    css("p", **{"@media (min-width: 1px)": {"@media screen": {"margin": 0}}})
+    assert str(css) == "@media screen and (min-width: 1px){p{margin:0}}"
+    with pytest.raises(ValueError):
+        css("p", **{"@media screen": {"@media print": {"margin": 0}}})
+
+
+def test_css_load_cached(tmp_path):
+    from makeweb.cache import FragmentCache
+    from makeweb import stylesheet
+
+    source = {
+        "body": {"color": "$ink", "h1": {"font_size": "2rem"}},
+        "@media print": {"body": {"color": "black"}},
+    }
+    cache = FragmentCache(str(tmp_path / "cache.db"))
+    css = CSS(theme={"ink": "#222"})
+    css.load(source, cache=cache)
+    expected = "body{color:#222}body h1{font-size:2rem}@media print{body{color:black}}"
+    assert str(css) == expected
+    assert cache.stats()[0] == 1
+    # A fresh process starts with an empty memo and reads the shared cache.
+    stylesheet._compiled.clear()
+    again = CSS(theme={"ink": "#222"})
+    again.load(source, cache=cache)
+    assert str(again) == expected
+    assert cache.stats()[0] == 1
+    dark = CSS(theme={"ink": "white"})
+    dark.load(source, cache=cache)
+    assert str(dark).startswith("body{color:white}")
+    assert cache.stats()[0] == 2
+
+
+def test_css_load_cached_by_version(tmp_path, monkeypatch):
+    from makeweb.cache import FragmentCache
+    from makeweb import stylesheet
+
+    cache = FragmentCache(str(tmp_path / "cache.db"))
+    CSS().load({"p": {"margin": 0}}, cache=cache)
+    assert cache.stats()[0] == 1
+    # Another makeweb version does not read rules compiled by this one.
+    monkeypatch.setattr(stylesheet, "_package", lambda: "upgraded")
+    stylesheet._compiled.clear()
+    css = CSS()
+    css.load({"p": {"margin": 0}}, cache=cache)
+    assert str(css) == "p{margin:0}"
+    assert cache.stats()[0] == 2
+
+
+def test_css_property_names():
+    from makeweb import fix_attribute, optimizer, stylesheet
+
+    names = stylesheet._property_names()
+    for name in optimizer._PROPERTIES:
+        python = name.replace("-", "_")
+        assert names[python] == fix_attribute(python) == name
+    assert names["_moz_user_select"] == "-moz-user-select"
+    css = CSS()
+    css("p", _webkit_box_shadow="none", _ms_grid_custom="1", my_custom_prop="x")
+    assert str(css) == "p{-webkit-box-shadow:none;-ms-grid-custom:1;my-custom-prop:x}"
+    # Unknown names are memoized on first use.
+    assert names["my_custom_prop"] == "my-custom-prop"
+    # Other flags get their own table.
+    defaults.replace_single_underscore = False
+    try:
+        css = CSS()
+        css("p", font_size="1rem")
+        assert str(css) == "p{font_size:1rem}"
+    finally:
+        defaults.replace_single_underscore = True
@@ -120,3 +120,19 @@ def test_get_local_variable_from_caller_level_4():
             doc = get_local_variable_from_caller("doc", Doc)
 
     caller_func()
+
+
+def test_write_atomic(tmp_path):
+    import os
+    from makeweb.utilities import write_atomic
+
+    path = os.path.join(str(tmp_path), "nested", "file.txt")
+    write_atomic(path, b"one")
+    write_atomic(path, b"two")
+    with open(path, "rb") as f:
+        assert f.read() == b"two"
+    assert os.listdir(os.path.dirname(path)) == ["file.txt"]
+    # Readable by other users, such as a front-end server.
+    mask = os.umask(0)
+    os.umask(mask)
+    assert os.stat(path).st_mode & 0o777 == 0o644 & ~mask